@@ -1,12 +1,34 @@
 # config_manager.py
+import copy
 import json
 import os
+import stat
+import tempfile
+import threading
+from contextlib import contextmanager
 from typing import Dict, List, Optional
 
 
+class BatchResult:
+    """batch_updates sonucu: saved, en dıştaki toplu yazımın başarılı olup olmadığı"""
+
+    def __init__(self):
+        self.saved = True
+
+
 class ConfigManager:
     def __init__(self, config_file="form_config.json"):
         self.config_file = config_file
+        # Ayrıştırılmış konfigürasyon ve okunduğu andaki (mtime, boyut) imzası
+        self._cached = None
+        self._cached_signature = None
+        self._lock = threading.RLock()
+        # Tek güncellemeler kilit altında oku-değiştir-yaz yapar; batch_updates
+        # iç içe kullanılabilir, en dıştaki bitince bir kez yazılır
+        self._batch_depth = 0
+        self._dirty = False
+        # Toplu güncellemenin gövdesi hata verdiyse bekleyen değişiklikler yazılmaz
+        self._batch_failed = False
         self.default_fields = [
             "Ad Soyad",
             "Cep Telefonu Numarası",
@@ -23,6 +45,23 @@ class ConfigManager:
             "İptal & İade Nedeni",
             "Tarih"
         ]
+        # Veri tipi TrOCR çözümleme profilini belirler:
+        # text, digits, iban, date, amount, email
+        self.default_data_types = {
+            "Cep Telefonu Numarası": "digits",
+            "E-Posta Adresi": "email",
+            "PARAM Hesap & Kart Numarası": "digits",
+            "Kart Numarasının Son 4 Hanesi": "digits",
+            "IBAN Numarası": "iban",
+            "İşlem Tarihi": "date",
+            "İşlem Tutarı": "amount",
+            "İade Edilecek Tutar": "amount",
+            "Tarih": "date"
+        }
+        # Sabit uzunluklu alanlar için en fazla karakter sayısı
+        self.default_max_lengths = {
+            "Kart Numarasının Son 4 Hanesi": 4
+        }
 
     def create_default_config(self) -> Dict:
         """Varsayılan konfigürasyon oluştur"""
@@ -32,12 +71,39 @@ class ConfigManager:
                 "model_type": "trocr",
                 "language": "tur+eng",
                 "preprocess": True,
-                "confidence_threshold": 0.5
+                "confidence_threshold": 0.5,
+                "ensemble_mode": "all",
+                "full_page_detection": False,
+                "use_pdf_text_layer": True,
+                "trocr_early_accept_score": 0.9,
+                "blank_field_threshold": 0.004,
+                "parallel_engines": True,
+                "engine_timeouts": {"tesseract": 15, "easyocr": 30, "trocr": 60}
             },
             "output_settings": {
                 "format": "json",
                 "encoding": "utf-8",
-                "pretty_print": True
+                "pretty_print": True,
+                "path": None,
+                "batch_size": 500,
+                "indexed_fields": ["IBAN Numarası", "Cep Telefonu Numarası", "İşlem Tarihi", "Tarih"]
+            },
+            "cache_settings": {
+                "enabled": True,
+                "memory_items": 2048,
+                "disk_path": None,
+                "disk_max_mb": 256
+            },
+            "registration_settings": {
+                "enabled": False,
+                "template_image": None,
+                "max_side": 1000,
+                "min_inliers": 12
+            },
+            "template_library": {
+                "enabled": False,
+                "directory": "templates",
+                "max_distance": 0.3
             }
         }
 
@@ -46,13 +112,40 @@ class ConfigManager:
             config["form_fields"][field] = {
                 "coordinates": None,
                 "required": True,
-                "data_type": "text"
+                "data_type": self.default_data_types.get(field, "text"),
+                "max_length": self.default_max_lengths.get(field)
             }
 
         return config
 
     def load_config(self) -> Dict:
-        """Konfigürasyon dosyasını yükle"""
+        """Konfigürasyonun değiştirilebilir kopyasını al"""
+        return copy.deepcopy(self._config())
+
+    def _config(self) -> Dict:
+        """Önbellekteki konfigürasyon - dosya yalnızca mtime/boyut değişince tekrar okunur
+
+        Dönen sözlük paylaşılır, değiştirilmemelidir.
+        """
+        with self._lock:
+            # Toplu güncelleme sürerken bekleyen değişiklikler esas alınır
+            if self._dirty:
+                return self._cached
+
+            signature = self._file_signature()
+            if self._cached is None or signature != self._cached_signature:
+                self._cached = self._read_config()
+                self._cached_signature = signature
+            return self._cached
+
+    def _file_signature(self):
+        try:
+            stat = os.stat(self.config_file)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _read_config(self) -> Dict:
         if os.path.exists(self.config_file):
             try:
                 with open(self.config_file, 'r', encoding='utf-8') as f:
@@ -64,74 +157,214 @@ class ConfigManager:
             return self.create_default_config()
 
     def save_config(self, config: Dict) -> bool:
-        """Konfigürasyonu dosyaya kaydet"""
+        """Konfigürasyonu dosyaya kaydet (toplu güncelleme içindeyse sonunda tek seferde)"""
+        with self._lock:
+            if self._batch_depth:
+                self._cached = config
+                self._dirty = True
+                return True
+            return self._write_config(config)
+
+    def _write_config(self, config: Dict) -> bool:
+        """Geçici dosyaya yazıp yerine taşı - okuyan süreçler yarım dosya görmez"""
+        directory = os.path.dirname(os.path.abspath(self.config_file))
+        temp_path = None
         try:
-            with open(self.config_file, 'w', encoding='utf-8') as f:
+            fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".form_config_", suffix=".tmp")
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
                 json.dump(config, f, ensure_ascii=False, indent=2)
-            return True
+                f.flush()
+                os.fsync(f.fileno())
+            # mkstemp dosyayı 0600 açar; os.replace bu izni taşıyacağından
+            # başka kullanıcıyla çalışan toplu/servis süreçleri şablonu okuyamazdı
+            os.chmod(temp_path, self._file_mode())
+            os.replace(temp_path, self.config_file)
         except IOError as e:
             print(f"Konfigürasyon kaydetme hatası: {e}")
+            if temp_path:
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+            # Toplu güncellemede önbellek yazılamayan sürümü tutuyor olabilir;
+            # sonraki okuma diskteki son sürümden yapılır
+            self._invalidate_cache()
             return False
 
+        self._cached = config
+        self._cached_signature = self._file_signature()
+        return True
+
+    def _file_mode(self):
+        """Var olan dosyanın izni, yoksa umask uygulanmış 0644"""
+        try:
+            return stat.S_IMODE(os.stat(self.config_file).st_mode)
+        except OSError:
+            umask = os.umask(0)
+            os.umask(umask)
+            return 0o644 & ~umask
+
+    def _invalidate_cache(self):
+        self._cached = None
+        self._cached_signature = None
+
+    @contextmanager
+    def batch_updates(self):
+        """İçindeki tüm güncellemeleri tek dosya yazımında topla
+
+        with config_manager.batch_updates() as batch:
+            config_manager.update_field_coordinates(...)
+            config_manager.update_ocr_settings(...)
+        if not batch.saved: ...
+
+        İçerideki güncellemeler True döner; gerçek yazım sonucu en dıştaki
+        bloğun batch.saved değerindedir. Blok hata verirse hiçbir değişiklik
+        yazılmaz.
+        """
+        with self._lock:
+            batch = BatchResult()
+            self._batch_depth += 1
+            try:
+                yield batch
+            except BaseException:
+                self._batch_failed = True
+                raise
+            finally:
+                self._batch_depth -= 1
+                if not self._batch_depth:
+                    failed, self._batch_failed = self._batch_failed, False
+                    if self._dirty:
+                        self._dirty = False
+                        if failed:
+                            self._invalidate_cache()
+                        else:
+                            batch.saved = self._write_config(self._cached)
+
     def update_field_coordinates(self, field_name: str, coordinates: List[int]) -> bool:
         """Alan koordinatlarını güncelle"""
-        config = self.load_config()
+        with self._lock:
+            config = self.load_config()
 
-        if field_name in config["form_fields"]:
-            config["form_fields"][field_name]["coordinates"] = coordinates
-            return self.save_config(config)
-        return False
+            if field_name in config["form_fields"]:
+                config["form_fields"][field_name]["coordinates"] = coordinates
+                return self.save_config(config)
+            return False
+
+    def update_all_coordinates(self, coordinates: Dict[str, List[int]]) -> bool:
+        """Birden fazla alanın koordinatlarını tek yazımda güncelle
+
+        Bilinmeyen alan adı varsa hiçbir alan yazılmaz.
+        """
+        with self.batch_updates() as batch:
+            form_fields = self._config()["form_fields"]
+            if any(field_name not in form_fields for field_name in coordinates):
+                return False
+            for field_name, coords in coordinates.items():
+                self.update_field_coordinates(field_name, coords)
+        return batch.saved
 
     def get_field_coordinates(self, field_name: str) -> Optional[List[int]]:
         """Alan koordinatlarını al"""
-        config = self.load_config()
+        config = self._config()
 
         if field_name in config["form_fields"]:
-            return config["form_fields"][field_name]["coordinates"]
+            coordinates = config["form_fields"][field_name]["coordinates"]
+            return list(coordinates) if coordinates else coordinates
         return None
 
     def get_all_coordinates(self) -> Dict[str, List[int]]:
         """Tüm koordinatları al"""
-        config = self.load_config()
+        config = self._config()
         coordinates = {}
 
         for field_name, field_config in config["form_fields"].items():
             if field_config["coordinates"]:
-                coordinates[field_name] = field_config["coordinates"]
+                coordinates[field_name] = list(field_config["coordinates"])
 
         return coordinates
 
+    def get_field_settings(self) -> Dict[str, Dict]:
+        """Alanların veri tipi, en fazla karakter ve boş alan eşiği ayarlarını al
+
+        blank_threshold None ise ocr_settings.blank_field_threshold, 0 ise
+        alan her zaman OCR'lanır.
+        """
+        config = self._config()
+        settings = {}
+
+        for field_name, field_config in config["form_fields"].items():
+            settings[field_name] = {
+                "data_type": field_config.get("data_type", "text"),
+                "max_length": field_config.get("max_length"),
+                "blank_threshold": field_config.get("blank_threshold")
+            }
+
+        return settings
+
     def add_custom_field(self, field_name: str, required: bool = True, data_type: str = "text") -> bool:
         """Özel alan ekle"""
-        config = self.load_config()
+        with self._lock:
+            config = self.load_config()
 
-        config["form_fields"][field_name] = {
-            "coordinates": None,
-            "required": required,
-            "data_type": data_type
-        }
+            config["form_fields"][field_name] = {
+                "coordinates": None,
+                "required": required,
+                "data_type": data_type
+            }
 
-        return self.save_config(config)
+            return self.save_config(config)
 
     def remove_field(self, field_name: str) -> bool:
         """Alan sil"""
-        config = self.load_config()
+        with self._lock:
+            config = self.load_config()
 
-        if field_name in config["form_fields"]:
-            del config["form_fields"][field_name]
-            return self.save_config(config)
-        return False
+            if field_name in config["form_fields"]:
+                del config["form_fields"][field_name]
+                return self.save_config(config)
+            return False
 
     def get_ocr_settings(self) -> Dict:
         """OCR ayarlarını al"""
-        config = self.load_config()
-        return config.get("ocr_settings", {})
+        config = self._config()
+        return dict(config.get("ocr_settings", {}))
 
     def update_ocr_settings(self, settings: Dict) -> bool:
         """OCR ayarlarını güncelle"""
-        config = self.load_config()
-        config["ocr_settings"].update(settings)
-        return self.save_config(config)
+        with self._lock:
+            config = self.load_config()
+            config["ocr_settings"].update(settings)
+            return self.save_config(config)
+
+    def get_output_settings(self) -> Dict:
+        """Sonuç çıktısı ayarlarını al"""
+        config = self._config()
+        settings = self.create_default_config()["output_settings"]
+        settings.update(config.get("output_settings", {}))
+        return settings
+
+    def get_cache_settings(self) -> Dict:
+        """OCR sonuç önbelleği ayarlarını al"""
+        config = self._config()
+        return dict(config.get("cache_settings", self.create_default_config()["cache_settings"]))
+
+    def get_registration_settings(self) -> Dict:
+        """Form hizalama ayarlarını al"""
+        config = self._config()
+        return dict(config.get("registration_settings", self.create_default_config()["registration_settings"]))
+
+    def update_registration_settings(self, settings: Dict) -> bool:
+        """Form hizalama ayarlarını güncelle"""
+        with self._lock:
+            config = self.load_config()
+            config.setdefault("registration_settings", self.create_default_config()["registration_settings"])
+            config["registration_settings"].update(settings)
+            return self.save_config(config)
+
+    def get_template_library_settings(self) -> Dict:
+        """Şablon kütüphanesi ayarlarını al"""
+        config = self._config()
+        return dict(config.get("template_library", self.create_default_config()["template_library"]))
 
     def export_template(self, template_name: str, coordinates: Dict[str, List[int]]) -> bool:
         """Koordinat şablonu dışa aktar"""
@@ -166,13 +399,14 @@ class ConfigManager:
             with open(template_file, 'r', encoding='utf-8') as f:
                 template_data = json.load(f)
 
-            config = self.load_config()
+            with self._lock:
+                config = self.load_config()
 
-            # Şablondaki alanları mevcut konfigürasyona ekle
-            for field_name, field_config in template_data["form_fields"].items():
-                config["form_fields"][field_name] = field_config
+                # Şablondaki alanları mevcut konfigürasyona ekle
+                for field_name, field_config in template_data["form_fields"].items():
+                    config["form_fields"][field_name] = field_config
 
-            return self.save_config(config)
+                return self.save_config(config)
         except (IOError, json.JSONDecodeError) as e:
             print(f"Şablon içe aktarma hatası: {e}")
             return False
\ No newline at end of file
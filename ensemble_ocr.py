@@ -5,38 +5,268 @@ import cv2
 import numpy as np
 from PIL import Image
 import difflib
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from model_registry import get_registry
+from ocr_metrics import METRICS, timer
+
+
+def _overlap_ratio(box, field_box):
+    """Kutunun alan içinde kalan kısmının kutu alanına oranı"""
+    x1 = max(box[0], field_box[0])
+    y1 = max(box[1], field_box[1])
+    x2 = min(box[2], field_box[2])
+    y2 = min(box[3], field_box[3])
+    if x2 <= x1 or y2 <= y1:
+        return 0.0
+
+    box_area = max((box[2] - box[0]) * (box[3] - box[1]), 1)
+    return (x2 - x1) * (y2 - y1) / box_area
+
+
+def assign_detections_to_fields(detections, field_coords, min_overlap=0.5):
+    """Her tespiti en çok örtüştüğü alana ata"""
+    assigned = {}
+    for detection in detections:
+        best_field = None
+        best_overlap = min_overlap
+        for field_name, coords in field_coords.items():
+            overlap = _overlap_ratio(detection[0], coords)
+            if overlap >= best_overlap:
+                best_field = field_name
+                best_overlap = overlap
+        if best_field:
+            assigned.setdefault(best_field, []).append(detection)
+    return assigned
+
+
+def join_in_reading_order(detections):
+    """Tespitleri satır satır, soldan sağa birleştir"""
+    ordered = sorted(detections, key=lambda d: (d[0][1] + d[0][3]) / 2)
+
+    lines = []
+    for detection in ordered:
+        box = detection[0]
+        center_y = (box[1] + box[3]) / 2
+        # Dikey merkezi önceki satırın yarı yüksekliği içindeyse aynı satırdır
+        if lines:
+            last_box = lines[-1][-1][0]
+            last_center = (last_box[1] + last_box[3]) / 2
+            if abs(center_y - last_center) <= (last_box[3] - last_box[1]) / 2:
+                lines[-1].append(detection)
+                continue
+        lines.append([detection])
+
+    return ' '.join(
+        detection[1]
+        for line in lines
+        for detection in sorted(line, key=lambda d: d[0][0])
+    )
 
 
 class EnsembleOCR:
     """Birden fazla OCR motorunu birleştirerek daha iyi sonuç elde etme"""
 
-    def __init__(self):
-        self.trocr_processor = OCRProcessor()
-        self.easyocr_reader = None
-        self.load_easyocr()
+    # Ensemble seçim mantığı değiştiğinde artırılır
+    CACHE_VERSION = 3
+
+    # Kademeli modda motorlar ucuzdan pahalıya doğru denenir
+    CASCADE_ORDER = ("tesseract", "easyocr", "trocr")
+
+    # Bir tespitin alana atanması için alanın içinde kalması gereken en az alan oranı
+    FULL_PAGE_MIN_OVERLAP = 0.5
+
+    # "all" modunda motor başına en fazla çalışma süresi (saniye); süre motor
+    # havuzda çalışmaya başlayınca işler (ocr_settings.engine_timeouts ezer)
+    ENGINE_TIMEOUTS = {"tesseract": 15, "easyocr": 30, "trocr": 60}
+    DEFAULT_ENGINE_TIMEOUT = 60
+    # Sırada bekleyen motorların başladığını fark etme aralığı (saniye)
+    ENGINE_START_POLL = 0.05
+
+    def __init__(self, trocr_processor=None, registry=None, lazy=False, cache=None,
+                 mode="all", confidence_threshold=0.5, full_page=False, model_type="trocr",
+                 early_accept_score=None, blank_threshold=None, parallel=True, engine_workers=6,
+                 engine_timeouts=None):
+        self.registry = registry or get_registry()
+        # True ise EasyOCR sayfa başına bir kez çalışır, alanlara örtüşmeyle dağıtılır
+        self.full_page = full_page
+        # "all": tüm motorlar çalışır ve sezgisel skorla seçilir
+        # "cascade": güven eşiği geçilince sonraki motorlar çalıştırılmaz
+        self.mode = mode
+        self.confidence_threshold = confidence_threshold
+        # Var olan bir OCRProcessor verilirse modeller yeniden yüklenmez
+        self.trocr_processor = trocr_processor or OCRProcessor(
+            registry=self.registry, lazy=lazy, cache=cache, model_type=model_type,
+            early_accept_score=early_accept_score, blank_threshold=blank_threshold
+        )
+        self.cache = cache
+        self._easyocr_reader = None
+
+        # Tesseract ayrı süreçte/C kütüphanesinde, torch ise GIL'i bırakarak
+        # çalıştığı için motorlar thread'lerde gerçekten paralel ilerler
+        self.parallel = parallel
+        self.engine_timeouts = dict(self.ENGINE_TIMEOUTS, **(engine_timeouts or {}))
+        self._executor = None
+        if parallel:
+            self._executor = ThreadPoolExecutor(max_workers=engine_workers, thread_name_prefix="ensemble-engine")
+
+        # lazy=True ise EasyOCR ilk kullanımda yüklenir
+        if not lazy:
+            self.load_easyocr()
 
     def load_easyocr(self):
-        """EasyOCR'ı yükle"""
-        try:
-            # Türkçe ve İngilizce desteği
-            self.easyocr_reader = easyocr.Reader(['tr', 'en'], gpu=True)
-            print("EasyOCR başarıyla yüklendi")
-        except Exception as e:
-            print(f"EasyOCR yüklenemedi: {e}")
-            try:
-                # GPU olmadan dene
-                self.easyocr_reader = easyocr.Reader(['tr', 'en'], gpu=False)
-                print("EasyOCR CPU modunda yüklendi")
-            except Exception as e2:
-                print(f"EasyOCR hiç yüklenemedi: {e2}")
+        """EasyOCR'ı yükle (kayıttaki paylaşılan Reader kullanılır)"""
+        if self._easyocr_reader is None:
+            self._easyocr_reader = self.registry.get_easyocr_reader() or False
+
+    @property
+    def easyocr_reader(self):
+        self.load_easyocr()
+        return self._easyocr_reader or None
+
+    def convert_pdf_to_image(self, pdf_path, page=0):
+        """PDF'yi resme dönüştür (model gerektirmez)"""
+        return self.trocr_processor.convert_pdf_to_image(pdf_path, page)
+
+    def extract_pdf_text_layer(self, pdf_path, coordinates_dict, page=0, image_width=None):
+        """Dijital PDF alanlarını metin katmanından oku (model gerektirmez)"""
+        return self.trocr_processor.extract_pdf_text_layer(pdf_path, coordinates_dict, page, image_width)
+
+    def cache_namespace(self):
+        """Önbellek anahtarına giren motor ve ayar bilgisi (motorlar yüklenmez, bkz. OCRProcessor)"""
+        return (f"ensemble:v{self.CACHE_VERSION}:{self.trocr_processor.cache_namespace()}"
+                f":easyocr={self.registry.availability('easyocr') is not False}"
+                f":mode={self.mode}:threshold={self.confidence_threshold}")
 
-    def extract_text_ensemble(self, image):
+    def _cache_key(self, image, data_type=None, max_chars=None):
+        if self.cache is None:
+            return None
+        return self.cache.key_for(image, f"{self.cache_namespace()}:{data_type or 'text'}:{max_chars}")
+
+    def is_cached(self, image, data_type=None, max_chars=None):
+        """Kırpıntının ensemble sonucu önbellekte var mı"""
+        cache_key = self._cache_key(image, data_type, max_chars)
+        return bool(cache_key) and self.cache.contains(cache_key)
+
+    def extract_text_ensemble(self, image, trocr_results=None, data_type=None, max_chars=None):
         """Birden fazla OCR motoru kullanarak en iyi sonucu seç"""
+        cache_key = self._cache_key(image, data_type, max_chars)
+        if cache_key:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        best_result, complete = self._extract_text_ensemble_uncached(image, trocr_results, data_type, max_chars)
+
+        # Hata veren veya süresi dolan motor varsa eksik sonuç kalıcı olmasın;
+        # anahtar, bu çağrıda yüklenen motorların gerçek durumuyla yeniden kurulur
+        if cache_key and complete:
+            self.cache.put(self._cache_key(image, data_type, max_chars), best_result)
+        return best_result
+
+    def _extract_text_ensemble_uncached(self, image, trocr_results=None, data_type=None, max_chars=None):
+        """Seçili moda göre motorları çalıştır, (sonuç, tüm motorlar bitti mi) döndür"""
+        if self.mode == "cascade":
+            return self._extract_text_cascade(image, data_type, max_chars)
+        return self._extract_text_all(image, trocr_results, data_type, max_chars)
+
+    def extract_text_cascade(self, image, data_type=None, max_chars=None):
+        """Motorları ucuzdan pahalıya çalıştır, güven eşiği geçilince dur"""
+        return self._extract_text_cascade(image, data_type, max_chars)[0]
+
+    def _extract_text_cascade(self, image, data_type=None, max_chars=None):
+        engines = {
+            "tesseract": lambda: self.trocr_processor.tesseract_extract_with_confidence(image, data_type, max_chars),
+            "easyocr": lambda: self._easyocr_extract_with_confidence(image, data_type),
+            "trocr": lambda: self.trocr_processor.trocr_extract_with_confidence(image, data_type, max_chars)
+        }
+
+        candidates = {}
+        complete = True
+        for method in self.CASCADE_ORDER:
+            try:
+                text, confidence = engines[method]()
+            except Exception as e:
+                print(f"{method} hatası: {e}")
+                complete = False
+                continue
+
+            if not text.strip():
+                continue
+
+            print(f"{method}: {text[:50]}... (güven: {confidence:.2f})")
+            if confidence >= self.confidence_threshold:
+                return text, complete
+            candidates[method] = (text, confidence)
+
+        if not candidates:
+            return "", complete
+
+        # Hiçbiri eşiği geçemediyse en yüksek güvenli sonucu al
+        best_method = max(candidates, key=lambda method: candidates[method][1])
+        return candidates[best_method][0], complete
+
+    def _easyocr_allowlist(self, data_type):
+        """Veri tipinin izin verdiği karakterler (EasyOCR allowlist'i için)"""
+        profile = OCRProcessor.DECODING_PROFILES.get(data_type or "text")
+        return profile["allowed_chars"] if profile else None
+
+    def _easyocr_extract_with_confidence(self, image, data_type=None):
+        """EasyOCR metnini ve ortalama güven skorunu döndür"""
+        if not self.easyocr_reader:
+            return "", 0.0
+
+        img_array = np.array(image)
+        if len(img_array.shape) == 3:
+            img_array = cv2.cvtColor(img_array, cv2.COLOR_RGB2BGR)
+
+        with timer("engine", engine="easyocr"):
+            detections = self.easyocr_reader.readtext(
+                img_array, detail=1, allowlist=self._easyocr_allowlist(data_type)
+            )
+        if not detections:
+            return "", 0.0
+
+        texts = [text for _, text, _ in detections]
+        confidences = [confidence for _, _, confidence in detections]
+        return ' '.join(texts), sum(confidences) / len(confidences)
+
+    def _extract_text_all(self, image, trocr_results=None, data_type=None, max_chars=None):
+        """Tüm motorları çalıştırıp (en iyi sonuç, tüm motorlar bitti mi) döndür
+
+        Motorlar thread havuzunda eşzamanlı çalışır; süresi dolan motorun
+        sonucu boş kabul edilir ve sonuç önbelleğe yazılmaz.
+        """
+        engines = {
+            "tesseract": lambda: self.trocr_processor.extract_with_tesseract(image, data_type, max_chars)
+        }
+        # Toplu işlemden gelen TrOCR çıktıları varsa TrOCR tekrar çalıştırılmaz
+        if trocr_results is None:
+            engines["trocr"] = lambda: self.trocr_processor.trocr_texts(image, data_type, max_chars)
+        if self.easyocr_reader:
+            engines["easyocr"] = lambda: self._easyocr_text(image, data_type)
+
+        outputs = self.run_engines(engines)
+        complete = all(output is not None for output in outputs.values())
         results = {}
 
+        # Tesseract tek geçişte bir kez çalışır, sonucu TrOCR adımıyla paylaşılır
+        tesseract_result = outputs["tesseract"] or ""
+
+        # TrOCR veya Tesseract bitmediyse birleşik sonuç OCRProcessor önbelleğine de yazılmaz
+        processor_complete = all(outputs[name] is not None for name in ("trocr", "tesseract") if name in outputs)
+
         # 1. TrOCR sonucu
         try:
-            trocr_result = self.trocr_processor.extract_text(image)
+            trocr_result = self.trocr_processor.extract_text(
+                image,
+                trocr_results=trocr_results if trocr_results is not None else outputs["trocr"] or [],
+                tesseract_result=tesseract_result,
+                data_type=data_type,
+                max_chars=max_chars,
+                cache_result=processor_complete
+            )
             results['trocr'] = trocr_result
             print(f"TrOCR: {trocr_result[:50]}...")
         except Exception as e:
@@ -44,33 +274,205 @@ class EnsembleOCR:
             results['trocr'] = ""
 
         # 2. EasyOCR sonucu
-        if self.easyocr_reader:
-            try:
-                # PIL'i OpenCV formatına çevir
-                img_array = np.array(image)
-                if len(img_array.shape) == 3:
-                    img_array = cv2.cvtColor(img_array, cv2.COLOR_RGB2BGR)
-
-                easyocr_results = self.easyocr_reader.readtext(img_array, detail=0)
-                easyocr_text = ' '.join(easyocr_results)
-                results['easyocr'] = easyocr_text
-                print(f"EasyOCR: {easyocr_text[:50]}...")
-            except Exception as e:
-                print(f"EasyOCR hatası: {e}")
-                results['easyocr'] = ""
+        if "easyocr" in engines:
+            results['easyocr'] = outputs["easyocr"] or ""
+            print(f"EasyOCR: {results['easyocr'][:50]}...")
 
         # 3. Tesseract sonucu (fallback olarak)
-        try:
-            tesseract_result = self.trocr_processor.extract_with_tesseract(image)
-            results['tesseract'] = tesseract_result
-            print(f"Tesseract: {tesseract_result[:50]}...")
-        except Exception as e:
-            print(f"Tesseract hatası: {e}")
-            results['tesseract'] = ""
+        results['tesseract'] = tesseract_result
+        print(f"Tesseract: {tesseract_result[:50]}...")
 
         # En iyi sonucu seç
         best_result = self.choose_best_result(results)
-        return best_result
+        return best_result, complete
+
+    def _easyocr_text(self, image, data_type=None):
+        """EasyOCR ile kırpıntıdaki metni oku"""
+        # PIL'i OpenCV formatına çevir
+        img_array = np.array(image)
+        if len(img_array.shape) == 3:
+            img_array = cv2.cvtColor(img_array, cv2.COLOR_RGB2BGR)
+
+        with timer("engine", engine="easyocr"):
+            easyocr_results = self.easyocr_reader.readtext(
+                img_array, detail=0, allowlist=self._easyocr_allowlist(data_type)
+            )
+        return ' '.join(easyocr_results)
+
+    def run_engines(self, engines):
+        """Motorları eşzamanlı çalıştır, {motor: sonuç} döndür
+
+        Her motor ENGINE_TIMEOUTS'taki süreyi, havuzda çalışmaya başladığı
+        andan itibaren aşarsa beklenmez; paylaşılan havuzda sıra bekleyen
+        motorun süresi işlemez. Sırada en uzun motor süresinden fazla bekleyen
+        motor da (havuzdaki thread'ler takılmışsa) bırakılır. Hata veren veya
+        süresi dolan motorun sonucu None olur.
+        """
+        outputs = {name: None for name in engines}
+
+        if not self.parallel:
+            for name, engine in engines.items():
+                try:
+                    outputs[name] = engine()
+                except Exception as e:
+                    METRICS.increment("engine_error", engine=name)
+                    print(f"{name} hatası: {e}")
+            return outputs
+
+        # Motorun thread'de başladığı an; süre buradan itibaren sayılır
+        started = {}
+
+        def run(name, engine):
+            started[name] = time.perf_counter()
+            return engine()
+
+        submitted = time.perf_counter()
+        queue_limit = submitted + max(self.engine_timeouts.values(), default=self.DEFAULT_ENGINE_TIMEOUT)
+        futures = {self._executor.submit(run, name, engine): name for name, engine in engines.items()}
+
+        def deadline(future):
+            name = futures[future]
+            if name not in started:
+                return queue_limit
+            return started[name] + self.engine_timeouts.get(name, self.DEFAULT_ENGINE_TIMEOUT)
+
+        pending = set(futures)
+        while pending:
+            now = time.perf_counter()
+            deadlines = {future: deadline(future) for future in pending}
+            expired = {future for future in pending if deadlines[future] <= now}
+            for future in expired:
+                # Çalışmaya başlamış thread durdurulamaz, yalnızca sonucu beklenmez
+                future.cancel()
+                METRICS.increment("engine_timeout", engine=futures[future])
+                print(f"{futures[future]} {self.engine_timeouts.get(futures[future])} sn içinde bitmedi, atlanıyor")
+            pending -= expired
+            if not pending:
+                break
+
+            timeout = min(deadlines[future] for future in pending) - now
+            # Sırada bekleyen motor başlayınca süresi hesaba katılmalı
+            if any(futures[future] not in started for future in pending):
+                timeout = min(timeout, self.ENGINE_START_POLL)
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    outputs[futures[future]] = future.result()
+                except Exception as e:
+                    METRICS.increment("engine_error", engine=futures[future])
+                    print(f"{futures[future]} hatası: {e}")
+
+        return outputs
+
+    def batch_extract_ensemble(self, image, coordinates_dict, progress_callback=None, field_settings=None):
+        """Birden fazla alan için toplu ensemble OCR"""
+        if self.full_page and self.easyocr_reader:
+            return self.extract_fields_full_page(image, coordinates_dict, progress_callback, field_settings)
+        return self._batch_extract_per_crop(image, coordinates_dict, progress_callback, field_settings)
+
+    def extract_fields_full_page(self, image, coordinates_dict, progress_callback=None, field_settings=None):
+        """EasyOCR'ı tüm sayfada bir kez çalıştır, tespitleri alan kutularına ata
+
+        Hiç tespit düşmeyen veya güveni eşiğin altında kalan alanlar
+        kırpıntı bazlı ensemble ile işlenir.
+        """
+        field_coords = {name: coords for name, coords in coordinates_dict.items() if coords}
+        total_fields = len(field_coords)
+
+        try:
+            detections = self._read_full_page(image)
+        except Exception as e:
+            print(f"EasyOCR tam sayfa hatası: {e}")
+            detections = []
+
+        assigned = assign_detections_to_fields(detections, field_coords, self.FULL_PAGE_MIN_OVERLAP)
+
+        results = {}
+        unmatched = {}
+        for field_name, coords in field_coords.items():
+            field_detections = assigned.get(field_name)
+            if field_detections:
+                confidence = sum(d[2] for d in field_detections) / len(field_detections)
+                if confidence >= self.confidence_threshold:
+                    results[field_name] = join_in_reading_order(field_detections)
+                    if progress_callback:
+                        progress_callback(len(results), total_fields, field_name)
+                    continue
+            unmatched[field_name] = coords
+
+        if unmatched:
+            print(f"Tam sayfada eşleşmeyen {len(unmatched)} alan kırpıntı bazlı işleniyor")
+            matched_count = len(results)
+
+            def on_fallback_progress(done, total, field_name):
+                if progress_callback:
+                    progress_callback(matched_count + done, total_fields, field_name)
+
+            results.update(self._batch_extract_per_crop(image, unmatched, on_fallback_progress, field_settings))
+
+        # Alan sırasını koru
+        return {field_name: results.get(field_name, "") for field_name in field_coords}
+
+    def _read_full_page(self, image):
+        """Tüm sayfada tespit + tanıma: [(x1, y1, x2, y2), metin, güven] listesi"""
+        img_array = np.array(image)
+        if len(img_array.shape) == 3:
+            img_array = cv2.cvtColor(img_array, cv2.COLOR_RGB2BGR)
+
+        with timer("engine", engine="easyocr_full_page"):
+            raw_detections = self.easyocr_reader.readtext(img_array, detail=1)
+
+        detections = []
+        for polygon, text, confidence in raw_detections:
+            xs = [point[0] for point in polygon]
+            ys = [point[1] for point in polygon]
+            detections.append(((min(xs), min(ys), max(xs), max(ys)), text, confidence))
+        return detections
+
+    def _batch_extract_per_crop(self, image, coordinates_dict, progress_callback=None, field_settings=None):
+        """Her alanı ayrı kırpıp ensemble ile işle"""
+        crops = self.trocr_processor.crop_fields(image, coordinates_dict)
+        field_profile = self.trocr_processor.field_profile
+        # Boş bırakılmış alanlar hiçbir motora gönderilmez
+        blank = self.trocr_processor.blank_fields(image, coordinates_dict, field_settings)
+
+        # TrOCR profil başına tek generate çağrısında çalışır (önbellekte olanlar hariç).
+        # Kademeli modda TrOCR yalnızca gerektiğinde çalıştığı için önceden toplu çalıştırılmaz.
+        trocr_results = {}
+        if self.mode != "cascade":
+            pending = {name: crop for name, crop in crops.items()
+                       if name not in blank and not self.is_cached(crop, *field_profile(field_settings, name))}
+            processed_crops = self.trocr_processor.preprocess_fields(
+                image, {name: coordinates_dict[name] for name in pending}
+            )
+            trocr_results = self.trocr_processor.extract_trocr_batch(pending, field_settings, processed_crops)
+
+        results = {}
+        total_fields = len([coords for coords in coordinates_dict.values() if coords])
+
+        for field_name, coords in coordinates_dict.items():
+            if not coords:
+                continue
+
+            if field_name in crops and field_name not in blank:
+                data_type, max_chars = field_profile(field_settings, field_name)
+                try:
+                    results[field_name] = self.extract_text_ensemble(
+                        crops[field_name],
+                        trocr_results=trocr_results.get(field_name),
+                        data_type=data_type,
+                        max_chars=max_chars
+                    )
+                except Exception as e:
+                    print(f"{field_name} alanı işlenirken hata: {e}")
+                    results[field_name] = ""
+            else:
+                results[field_name] = ""
+
+            if progress_callback:
+                progress_callback(len(results), total_fields, field_name)
+
+        return results
 
     def choose_best_result(self, results):
         """Sonuçlar arasından en iyisini seç"""
@@ -84,6 +486,10 @@ class EnsembleOCR:
         if len(valid_results) == 1:
             return list(valid_results.values())[0]
 
+        with timer("scoring"):
+            return self._score_results(valid_results)
+
+    def _score_results(self, valid_results):
         # Çoklu sonuç varsa scoring yap
         scores = {}
 
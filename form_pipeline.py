@@ -0,0 +1,272 @@
+# form_pipeline.py
+import threading
+import time
+
+from PIL import Image
+
+from form_registration import create_aligner
+from ocr_cache import create_cache
+from ocr_metrics import METRICS, timer
+from ocr_processor import coordinates_region, map_coordinates
+from template_library import FormTemplate, TemplateLibrary, create_library, scale_coordinates
+
+SUPPORTED_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.pdf')
+
+
+def pipeline_settings(config_manager):
+    """Konfigürasyondan FormPipeline ayarlarını oluştur (komut satırı bunları ezebilir)"""
+    ocr_settings = config_manager.get_ocr_settings()
+    return {
+        "coordinates": config_manager.get_all_coordinates(),
+        "field_settings": config_manager.get_field_settings(),
+        "cache_settings": dict(config_manager.get_cache_settings()),
+        "registration_settings": dict(config_manager.get_registration_settings()),
+        "library_settings": dict(config_manager.get_template_library_settings()),
+        "output_settings": config_manager.get_output_settings(),
+        "processor_options": {
+            "model_type": ocr_settings.get("model_type", "trocr"),
+            "early_accept_score": ocr_settings.get("trocr_early_accept_score"),
+            "blank_threshold": ocr_settings.get("blank_field_threshold")
+        },
+        "ensemble_options": {
+            "mode": ocr_settings.get("ensemble_mode", "all"),
+            "confidence_threshold": ocr_settings.get("confidence_threshold", 0.5),
+            "full_page": ocr_settings.get("full_page_detection", False),
+            "parallel": ocr_settings.get("parallel_engines", True),
+            "engine_timeouts": ocr_settings.get("engine_timeouts")
+        },
+        "pdf_options": {
+            "dpi": None,
+            "render_region": True,
+            "text_layer": ocr_settings.get("use_pdf_text_layer", True)
+        }
+    }
+
+
+def output_field_names(settings):
+    """Çıktı sütunları: konfigürasyondaki alanlar ve kütüphane şablonlarının alanları"""
+    names = dict.fromkeys(settings["coordinates"])
+    library_settings = settings.get("library_settings") or {}
+    if library_settings.get("enabled"):
+        for template in TemplateLibrary(library_settings["directory"]).templates:
+            names.update(dict.fromkeys(template.coordinates))
+    return list(names)
+
+
+def create_pipeline(settings, use_ensemble=False):
+    """Ayarlardan OCR motorunu, önbelleği ve hizalayıcıyı kurup FormPipeline döndür"""
+    cache = create_cache(settings["cache_settings"])
+
+    if use_ensemble:
+        from ensemble_ocr import EnsembleOCR
+        ocr = EnsembleOCR(cache=cache, **settings["processor_options"], **settings["ensemble_options"])
+    else:
+        from ocr_processor import OCRProcessor
+        ocr = OCRProcessor(cache=cache, **settings["processor_options"])
+
+    return FormPipeline(
+        ocr,
+        settings["coordinates"],
+        field_settings=settings["field_settings"],
+        pdf_options=settings["pdf_options"],
+        aligner=create_aligner(settings["registration_settings"]),
+        library=create_library(settings.get("library_settings")),
+        registration_settings=settings["registration_settings"]
+    )
+
+
+class FormPipeline:
+    """Form dosyasını sayfalara ayırıp alanları okuyan, arayüzden bağımsız akış
+
+    ocr_batch işçileri ve ocr_service aynı akışı kullanır.
+    """
+
+    # Şablon eşleştirmesi için PDF sayfalarının çizim çözünürlüğü; parmak izi
+    # 24x32'lik ızgarada alındığından tam çözünürlük gerekmez
+    MATCH_DPI = 36
+
+    def __init__(self, ocr, coordinates, field_settings=None, pdf_options=None, aligner=None, library=None,
+                 registration_settings=None):
+        self.ocr = ocr
+        self.use_ensemble = hasattr(ocr, "batch_extract_ensemble")
+        self.coordinates = coordinates
+        self.field_settings = field_settings or {}
+        self.pdf_options = pdf_options or {"dpi": None, "render_region": True, "text_layer": True}
+        self.aligner = aligner
+        self.library = library
+        self.registration_settings = registration_settings or {}
+        # Kütüphanede eşleşme bulunamayan sayfalar konfigürasyondaki alanlarla okunur
+        self.default_template = FormTemplate(None, coordinates, self.field_settings, None, None)
+        self._template_aligners = {}
+        self._aligner_lock = threading.Lock()
+
+    @property
+    def processor(self):
+        """PDF dönüştürme için alttaki OCRProcessor"""
+        return self.ocr.trocr_processor if self.use_ensemble else self.ocr
+
+    def iter_form_pages(self, file_path):
+        """Dosyadaki her formu (resim, sayfa koordinatları, sayfa no, metin katmanı alanları, şablon) olarak üret
+
+        Çok sayfalı PDF'lerde her sayfa ayrı bir form kabul edilir ve belge
+        tek kez açılıp sayfalar istendikçe çizilir. Dijital PDF'lerde metin
+        katmanından okunan alanlar OCR'a gönderilmez. Hizalama açıksa
+        koordinatlar her sayfada şablon resmine göre taşınır. Şablon
+        kütüphanesi varsa her sayfa için en yakın şablon seçilir.
+        """
+        if self.library is not None:
+            yield from self._iter_matched_pages(file_path)
+            return
+
+        if not file_path.lower().endswith('.pdf'):
+            image = Image.open(file_path)
+            coordinates = self.coordinates
+            if self.aligner:
+                coordinates = self.aligner.align_coordinates(image, coordinates)
+            yield image, coordinates, None, {}, self.default_template
+            return
+
+        # Hizalama tüm sayfaya ihtiyaç duyar, bölge kırpması yapılmaz
+        render_region = self.pdf_options["render_region"] and not self.aligner
+        region = coordinates_region(self.coordinates) if render_region else None
+        text_layer_fields = self.coordinates if self.pdf_options["text_layer"] else None
+
+        for rendered in self.processor.iter_pdf_pages(file_path, dpi=self.pdf_options["dpi"], region=region,
+                                                      text_layer_fields=text_layer_fields):
+            text_fields = rendered.text_fields or {}
+            remaining = {name: coords for name, coords in self.coordinates.items() if name not in text_fields}
+            coordinates = map_coordinates(remaining, rendered.offset, rendered.scale)
+            if self.aligner and remaining:
+                # Matris şablon ile sayfa arasındaki çözünürlük farkını da içerir; hizalanamazsa
+                # çizim çözünürlüğüne ölçeklenmiş koordinatlar kullanılır
+                coordinates = self.aligner.align_coordinates(rendered.image, remaining, fallback=coordinates)
+            yield rendered.image, coordinates, rendered.index, text_fields, self.default_template
+
+    def _iter_matched_pages(self, file_path):
+        """Farklı form sürümleri karışık gelirken her sayfayı en yakın şablonla oku"""
+        if file_path.lower().endswith('.pdf'):
+            page_objects = self.processor.iter_pdf_page_objects(file_path)
+            if page_objects is not None:
+                yield from self._iter_matched_pdf_pages(page_objects)
+                return
+            # pdfplumber açamadıysa pdf2image ile çizilir, metin katmanı okunmaz
+            pages = ((rendered.image, rendered.index, rendered.scale)
+                     for rendered in self.processor.iter_pdf_pages(file_path, dpi=self.pdf_options["dpi"]))
+        else:
+            pages = [(Image.open(file_path), None, 1.0)]
+
+        for image, page, scale in pages:
+            if image is None:
+                continue
+            template = self._match_template(image)
+            yield image, self._page_coordinates(image, template, template.coordinates, scale), page, {}, template
+
+    def _iter_matched_pdf_pages(self, page_objects):
+        """PDF sayfalarını açık belgeden şablonla eşleştirip oku
+
+        Eşleştirme için sayfa MATCH_DPI'da küçük çizilir. Metin katmanı aynı
+        açık sayfadan seçilen şablonun koordinatlarıyla okunur; OCR'lanacak
+        alan kalmadıysa sayfa tam çözünürlükte hiç çizilmez (resim None).
+        """
+        dpi = self.pdf_options["dpi"]
+        for index, page_obj in page_objects:
+            thumbnail = self.processor.render_pdf_page(page_obj, index, dpi=self.MATCH_DPI).image
+            template = self._match_template(thumbnail)
+
+            text_fields = {}
+            if self.pdf_options["text_layer"]:
+                image_width = template.image_size[0] if template.image_size else None
+                text_fields = self.processor.extract_text_layer(page_obj, template.coordinates, image_width)
+            remaining = {name: coords for name, coords in template.coordinates.items() if name not in text_fields}
+            if not remaining:
+                yield None, {}, index, text_fields, template
+                continue
+
+            rendered = self.processor.render_pdf_page(page_obj, index, dpi=dpi)
+            coordinates = self._page_coordinates(rendered.image, template, remaining, rendered.scale)
+            yield rendered.image, coordinates, index, text_fields, template
+
+    def _match_template(self, image):
+        with timer("template_match"):
+            template = self.library.match(image)
+        if template is None:
+            METRICS.increment("template_unmatched")
+            template = self.default_template
+        return template
+
+    def _page_coordinates(self, image, template, coordinates, scale):
+        """Şablon koordinatlarını sayfa resmine ölçekle; hizalama açıksa şablon resmine hizala
+
+        Hizalanamazsa ölçeklenmiş koordinatlar kullanılır.
+        """
+        if template.image_size:
+            scaled = scale_coordinates(coordinates, image.width / template.image_size[0],
+                                       image.height / template.image_size[1])
+        else:
+            scaled = map_coordinates(coordinates, (0, 0), scale)
+
+        aligner = self._aligner_for(template)
+        if aligner and coordinates:
+            return aligner.align_coordinates(image, coordinates, fallback=scaled)
+        return scaled
+
+    def _aligner_for(self, template):
+        """Şablonun kendi resmine hizalayan FormAligner (hizalama kapalıysa None)"""
+        if template.template_image is None:
+            return self.aligner
+        if not self.registration_settings.get("enabled"):
+            return None
+
+        with self._aligner_lock:
+            if template.name not in self._template_aligners:
+                settings = dict(self.registration_settings, template_image=template.template_image)
+                self._template_aligners[template.name] = create_aligner(settings)
+            return self._template_aligners[template.name]
+
+    def extract(self, image, coordinates, field_settings=None):
+        """Sayfadaki alanları OCR'la, boşlukları kırpılmış sonuçları döndür"""
+        if image is None or not coordinates:
+            return {}
+
+        field_settings = self.field_settings if field_settings is None else field_settings
+        if self.use_ensemble:
+            results = self.ocr.batch_extract_ensemble(image, coordinates, field_settings=field_settings)
+        else:
+            results = self.ocr.batch_extract(image, coordinates, field_settings=field_settings)
+        return {field_name: text.strip() for field_name, text in results.items()}
+
+    def process_file(self, file_path):
+        """Tek bir form dosyasını işle, form (sayfa) başına bir kayıt döndür"""
+        records = []
+        start = time.perf_counter()
+
+        try:
+            for image, coordinates, page, text_fields, template in self.iter_form_pages(file_path):
+                record = {"file": file_path, "page": page, "results": {}, "error": None,
+                          "text_layer_fields": sorted(text_fields)}
+                if self.library is not None:
+                    record["template"] = template.name
+                try:
+                    ocr_results = self.extract(image, coordinates, template.field_settings)
+                    # Alan sırası şablondaki gibi kalsın
+                    record["results"] = {
+                        field_name: text_fields.get(field_name, ocr_results.get(field_name, ""))
+                        for field_name in template.coordinates
+                    }
+                except Exception as e:
+                    METRICS.increment("form_error")
+                    record["error"] = str(e)
+
+                elapsed = time.perf_counter() - start
+                METRICS.observe("form", elapsed)
+                record["elapsed"] = round(elapsed, 3)
+                records.append(record)
+                start = time.perf_counter()
+        except Exception as e:
+            records.append({"file": file_path, "page": None, "results": {}, "error": str(e),
+                            "elapsed": round(time.perf_counter() - start, 3)})
+
+        if not records:
+            records.append({"file": file_path, "page": None, "results": {},
+                            "error": "Dosya resme dönüştürülemedi", "elapsed": 0.0})
+        return records
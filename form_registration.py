@@ -0,0 +1,187 @@
+# form_registration.py
+import threading
+from collections import namedtuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from ocr_metrics import METRICS, timer
+
+DEFAULT_REGISTRATION_SETTINGS = {
+    "enabled": False,
+    "template_image": None,
+    "max_side": 1000,
+    "min_inliers": 12
+}
+
+# matrix: şablon koordinatlarını sayfa koordinatlarına taşıyan 2x3 afin matris
+Alignment = namedtuple("Alignment", ["matrix", "method", "score"])
+
+
+def transform_coordinates(coordinates_dict, matrix):
+    """Alan kutularını afin matrisle taşı, dönmüş kutuyu çevreleyen dikdörtgeni al"""
+    transformed = {}
+    for field_name, coords in coordinates_dict.items():
+        if not coords:
+            transformed[field_name] = coords
+            continue
+
+        x1, y1, x2, y2 = coords
+        corners = np.array([[x1, y1, 1], [x2, y1, 1], [x2, y2, 1], [x1, y2, 1]], dtype=np.float64)
+        points = corners @ np.asarray(matrix, dtype=np.float64).T
+        transformed[field_name] = [
+            max(0, int(round(points[:, 0].min()))),
+            max(0, int(round(points[:, 1].min()))),
+            int(round(points[:, 0].max())),
+            int(round(points[:, 1].max()))
+        ]
+    return transformed
+
+
+def _to_gray_array(image):
+    img = np.asarray(image if image.mode in ('RGB', 'L') else image.convert('RGB'))
+    if img.ndim == 3:
+        return cv2.cvtColor(img, cv2.COLOR_RGB2GRAY)
+    return img
+
+
+def _downscale(gray, max_side):
+    """En uzun kenarı max_side olacak şekilde küçült, (resim, ölçek) döndür"""
+    scale = min(1.0, max_side / max(gray.shape))
+    if scale < 1.0:
+        gray = cv2.resize(gray, (int(gray.shape[1] * scale), int(gray.shape[0] * scale)),
+                          interpolation=cv2.INTER_AREA)
+    return gray, scale
+
+
+def _to_full_resolution(matrix, template_scale, page_scale_x, page_scale_y):
+    """Küçük resimlerde bulunan matrisi tam çözünürlük koordinatlarına çevir"""
+    full = np.vstack([matrix, [0, 0, 1]])
+    full = np.diag([1 / page_scale_x, 1 / page_scale_y, 1]) @ full @ np.diag([template_scale, template_scale, 1])
+    return full[:2]
+
+
+class FormAligner:
+    """Gelen sayfayı şablon resmine hizalayıp alan kutularını taşıyan kayıt aşaması
+
+    Önce ORB öznitelik eşleştirmesi (döndürme + ölçek + kayma) denenir;
+    yeterli eşleşme yoksa ECC ile döndürme + kayma aranır. İki yöntem de
+    en uzun kenarı max_side olan küçültülmüş resimlerde çalışır.
+    """
+
+    # Bu sınırların dışındaki ölçek / açı hatalı eşleşme kabul edilir
+    MAX_SCALE_DEVIATION = 0.25
+    MAX_ROTATION_DEGREES = 15
+
+    def __init__(self, template_image, max_side=1000, min_inliers=12):
+        self.max_side = max_side
+        self.min_inliers = min_inliers
+        self.template_size = template_image.size
+
+        self._template_gray, self._template_scale = _downscale(_to_gray_array(template_image), max_side)
+        self._orb = cv2.ORB_create(nfeatures=2000)
+        self._matcher = cv2.BFMatcher(cv2.NORM_HAMMING, crossCheck=True)
+        # ORB dedektörü ve BFMatcher'ın thread güvenliği belgelenmemiş; servis
+        # işçileri ve şablon hizalayıcıları aynı örneği paylaşabilir
+        self._feature_lock = threading.Lock()
+        # Şablon öznitelikleri bir kez çıkarılır
+        self._template_keypoints, self._template_descriptors = self._orb.detectAndCompute(self._template_gray, None)
+
+    def align(self, image):
+        """Sayfa için Alignment döndür (hizalanamazsa None)"""
+        page_gray, page_scale = _downscale(_to_gray_array(image), self.max_side)
+
+        alignment = self._align_orb(page_gray, page_scale)
+        if alignment is None:
+            alignment = self._align_ecc(page_gray, page_scale)
+        if alignment is None or not self._is_plausible(alignment.matrix, image.size):
+            return None
+        return alignment
+
+    def align_coordinates(self, image, coordinates_dict, fallback=None):
+        """Alan koordinatlarını sayfaya taşı
+
+        Hizalanamazsa fallback (sayfa çözünürlüğüne ölçeklenmiş koordinatlar)
+        döndürülür; verilmemişse koordinatlar olduğu gibi kullanılır.
+        """
+        try:
+            with timer("align"):
+                alignment = self.align(image)
+        except cv2.error as e:
+            print(f"Form hizalama hatası: {e}")
+            alignment = None
+
+        if alignment is None:
+            METRICS.increment("align_failed")
+            print("Form şablona hizalanamadı, hizalamasız koordinatlar kullanılıyor")
+            return coordinates_dict if fallback is None else fallback
+        return transform_coordinates(coordinates_dict, alignment.matrix)
+
+    def _align_orb(self, page_gray, page_scale):
+        if self._template_descriptors is None:
+            return None
+
+        with self._feature_lock:
+            keypoints, descriptors = self._orb.detectAndCompute(page_gray, None)
+            if descriptors is None:
+                return None
+            matches = self._matcher.match(self._template_descriptors, descriptors)
+
+        if len(matches) < self.min_inliers:
+            return None
+
+        src = np.float32([self._template_keypoints[m.queryIdx].pt for m in matches])
+        dst = np.float32([keypoints[m.trainIdx].pt for m in matches])
+        matrix, inliers = cv2.estimateAffinePartial2D(src, dst, method=cv2.RANSAC, ransacReprojThreshold=3.0)
+        if matrix is None or int(inliers.sum()) < self.min_inliers:
+            return None
+
+        full = _to_full_resolution(matrix, self._template_scale, page_scale, page_scale)
+        return Alignment(full, "orb", int(inliers.sum()))
+
+    def _align_ecc(self, page_gray, page_scale):
+        # ECC ölçek aramaz, sayfa şablonun küçük boyutuna getirilir
+        height, width = self._template_gray.shape
+        scale_x = page_scale * width / page_gray.shape[1]
+        scale_y = page_scale * height / page_gray.shape[0]
+        page_resized = cv2.resize(page_gray, (width, height), interpolation=cv2.INTER_AREA)
+
+        matrix = np.eye(2, 3, dtype=np.float32)
+        criteria = (cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 100, 1e-5)
+        try:
+            score, matrix = cv2.findTransformECC(
+                self._template_gray, page_resized, matrix, cv2.MOTION_EUCLIDEAN, criteria, None, 5
+            )
+        except cv2.error:
+            # Yakınsamadı
+            return None
+
+        full = _to_full_resolution(matrix, self._template_scale, scale_x, scale_y)
+        return Alignment(full, "ecc", float(score))
+
+    def _is_plausible(self, matrix, page_size):
+        """Aşırı ölçek veya dönme içeren matrisleri reddet"""
+        linear = np.asarray(matrix)[:, :2]
+        # Şablon ile sayfa farklı çözünürlükte olabilir, beklenen ölçek boyut oranıdır
+        expected_scale = page_size[0] / self.template_size[0]
+        scale = np.sqrt(abs(np.linalg.det(linear))) / expected_scale
+        rotation = np.degrees(np.arctan2(linear[1, 0], linear[0, 0]))
+        return abs(scale - 1) <= self.MAX_SCALE_DEVIATION and abs(rotation) <= self.MAX_ROTATION_DEGREES
+
+
+def create_aligner(settings=None):
+    """registration_settings sözlüğünden hizalayıcı oluştur (kapalıysa None)"""
+    merged = dict(DEFAULT_REGISTRATION_SETTINGS)
+    merged.update(settings or {})
+
+    if not merged["enabled"] or not merged["template_image"]:
+        return None
+
+    try:
+        with Image.open(merged["template_image"]) as template_image:
+            template_image.load()
+            return FormAligner(template_image, max_side=merged["max_side"], min_inliers=merged["min_inliers"])
+    except (IOError, cv2.error) as e:
+        print(f"Şablon resmi yüklenemedi, hizalama kapalı: {e}")
+        return None
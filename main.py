@@ -1,8 +1,6 @@
 # main.py
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-import json
-import os
 from PIL import Image, ImageTk
 import threading
 
@@ -15,6 +13,10 @@ except ImportError:
 
     USE_ENSEMBLE = False
 from config_manager import ConfigManager
+from form_registration import create_aligner
+from ocr_cache import create_cache
+from ocr_metrics import METRICS, timer
+from result_sinks import create_sink
 
 
 class OCRFormReader:
@@ -23,14 +25,39 @@ class OCRFormReader:
         self.root.title("OCR Form Okuyucu")
         self.root.geometry("1200x800")
 
+        self.config_manager = ConfigManager()
+        # Kutu düzeltip tekrar çalıştırınca değişmeyen alanlar önbellekten gelir
+        cache = create_cache(self.config_manager.get_cache_settings())
+        ocr_settings = self.config_manager.get_ocr_settings()
+        model_type = ocr_settings.get("model_type", "trocr")
+        early_accept_score = ocr_settings.get("trocr_early_accept_score")
+        blank_threshold = ocr_settings.get("blank_field_threshold")
+
+        # Modeller arayüzü bekletmeden arka planda yüklenir
         if USE_ENSEMBLE:
-            self.ocr_processor = EnsembleOCR()
+            self.ocr_processor = EnsembleOCR(
+                lazy=True,
+                cache=cache,
+                mode=ocr_settings.get("ensemble_mode", "all"),
+                confidence_threshold=ocr_settings.get("confidence_threshold", 0.5),
+                full_page=ocr_settings.get("full_page_detection", False),
+                model_type=model_type,
+                early_accept_score=early_accept_score,
+                blank_threshold=blank_threshold,
+                parallel=ocr_settings.get("parallel_engines", True),
+                engine_timeouts=ocr_settings.get("engine_timeouts")
+            )
             print("Ensemble OCR aktif - Daha iyi sonuçlar için birden fazla model kullanılıyor")
+            self.ocr_processor.registry.warmup(trocr_backend=model_type)
         else:
-            self.ocr_processor = OCRProcessor()
+            self.ocr_processor = OCRProcessor(lazy=True, cache=cache, model_type=model_type,
+                                             early_accept_score=early_accept_score,
+                                             blank_threshold=blank_threshold)
             print("Sadece TrOCR kullanılıyor")
+            self.ocr_processor.registry.warmup(engines=("trocr", "tesseract"), trocr_backend=model_type)
 
-        self.config_manager = ConfigManager()
+        # Kayık / kaymış taramalarda alan kutularını şablona göre taşır
+        self.aligner = create_aligner(self.config_manager.get_registration_settings())
 
         self.current_image = None
         self.image_path = None
@@ -96,14 +123,18 @@ class OCRFormReader:
                                                                                                    sticky=(tk.W, tk.E),
                                                                                                    pady=10)
 
+        # Hizalama şablonu
+        ttk.Button(control_frame, text="Şablon Resmi Olarak Kaydet", command=self.save_template_image).grid(
+            row=6, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=5)
+
         # Progress bar
         self.progress_var = tk.DoubleVar()
         self.progress_bar = ttk.Progressbar(control_frame, variable=self.progress_var, maximum=100)
-        self.progress_bar.grid(row=6, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=5)
+        self.progress_bar.grid(row=7, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=5)
 
         # Durum etiketi
         self.status_var = tk.StringVar(value="Hazır")
-        ttk.Label(control_frame, textvariable=self.status_var).grid(row=7, column=0, columnspan=2, pady=5)
+        ttk.Label(control_frame, textvariable=self.status_var).grid(row=8, column=0, columnspan=2, pady=5)
 
         # Sağ panel - Resim görüntüleyici
         image_frame = ttk.LabelFrame(main_frame, text="Resim", padding="10")
@@ -280,6 +311,21 @@ class OCRFormReader:
         except ValueError:
             messagebox.showerror("Hata", "Lütfen geçerli koordinat değerleri girin")
 
+    def save_template_image(self):
+        """Yüklü formu, koordinatların çizildiği hizalama şablonu olarak kaydet"""
+        if not self.current_image:
+            messagebox.showwarning("Uyarı", "Lütfen önce bir dosya yükleyin")
+            return
+
+        template_path = "form_template.png"
+        try:
+            self.current_image.save(template_path)
+            self.config_manager.update_registration_settings({"enabled": True, "template_image": template_path})
+            self.aligner = create_aligner(self.config_manager.get_registration_settings())
+            self.status_var.set(f"Hizalama şablonu {template_path} olarak kaydedildi")
+        except Exception as e:
+            messagebox.showerror("Hata", f"Şablon kaydedilirken hata: {str(e)}")
+
     def draw_all_coordinates(self):
         """Tüm koordinatları çiz"""
         if not hasattr(self, 'photo'):
@@ -329,51 +375,67 @@ class OCRFormReader:
             self.status_var.set("OCR işlemi başlatılıyor...")
             self.progress_var.set(0)
 
-            results = {}
+            # Taranmış form kaymış veya dönmüşse kutuları şablona göre taşı
+            if self.aligner:
+                self.status_var.set("Form şablona hizalanıyor...")
+                coordinates = self.aligner.align_coordinates(self.current_image, coordinates)
+
+            # Dijital PDF'lerde metni olan alanlar OCR'a gönderilmez
+            text_fields = {}
+            use_text_layer = self.config_manager.get_ocr_settings().get("use_pdf_text_layer", True)
+            if use_text_layer and self.image_path and self.image_path.lower().endswith('.pdf'):
+                text_fields = self.ocr_processor.extract_pdf_text_layer(
+                    self.image_path, coordinates, image_width=self.current_image.width
+                )
+            ocr_coordinates = {k: v for k, v in coordinates.items() if k not in text_fields}
+            field_settings = self.config_manager.get_field_settings()
             total_fields = len(coordinates)
 
-            for i, (field_name, coords) in enumerate(coordinates.items()):
+            def on_progress(done, total, field_name):
                 self.status_var.set(f"İşleniyor: {field_name}")
+                self.progress_var.set(((len(text_fields) + done) / total_fields) * 100)
+
+            # Tüm alanlar toplu işlenir - TrOCR tek seferde çalışır
+            ocr_results = {}
+            if ocr_coordinates and USE_ENSEMBLE:
+                ocr_results = self.ocr_processor.batch_extract_ensemble(
+                    self.current_image, ocr_coordinates, progress_callback=on_progress,
+                    field_settings=field_settings
+                )
+            elif ocr_coordinates:
+                ocr_results = self.ocr_processor.batch_extract(
+                    self.current_image, ocr_coordinates, progress_callback=on_progress,
+                    field_settings=field_settings
+                )
 
-                # Bölgeyi kırp
-                x1, y1, x2, y2 = coords
-                cropped_image = self.current_image.crop((x1, y1, x2, y2))
-
-                # OCR uygula - Ensemble kullan
-                if USE_ENSEMBLE:
-                    text = self.ocr_processor.extract_text_ensemble(cropped_image)
-                else:
-                    text = self.ocr_processor.extract_text(cropped_image)
-
-                results[field_name] = text.strip()
-
-                # Progress güncelle
-                progress = ((i + 1) / total_fields) * 100
-                self.progress_var.set(progress)
+            results = {
+                field_name: text_fields.get(field_name, ocr_results.get(field_name, "")).strip()
+                for field_name in coordinates
+            }
 
             # Sonuçları kaydet
             self.save_results(results)
             self.status_var.set("OCR işlemi tamamlandı")
 
+            # Süre nereye gidiyor: aşama özetini konsola yaz
+            METRICS.print_report()
+
         except Exception as e:
             self.status_var.set("Hata oluştu")
             messagebox.showerror("Hata", f"OCR işleminde hata: {str(e)}")
 
     def save_results(self, results):
-        """Sonuçları JSON dosyasına kaydet"""
-        try:
-            # Dosya adını oluştur
-            if self.image_path:
-                base_name = os.path.splitext(os.path.basename(self.image_path))[0]
-                output_path = f"{base_name}_ocr_results.json"
-            else:
-                output_path = "ocr_results.json"
+        """Sonuçları output_settings'te seçilen çıktıya kaydet
 
-            # JSON dosyasına kaydet
-            with open(output_path, 'w', encoding='utf-8') as f:
-                json.dump(results, f, ensure_ascii=False, indent=2)
+        Varsayılan json biçimi form başına <ad>_ocr_results.json yazar;
+        jsonl, csv ve sqlite biçimleri tek dosyaya ekler.
+        """
+        try:
+            record = {"file": self.image_path, "page": None, "results": results, "error": None}
+            with timer("write"), create_sink(self.config_manager.get_output_settings(), list(results)) as sink:
+                sink.write(record)
 
-            messagebox.showinfo("Başarılı", f"Sonuçlar {output_path} dosyasına kaydedildi")
+            messagebox.showinfo("Başarılı", f"Sonuçlar {sink.path} dosyasına kaydedildi")
 
         except Exception as e:
             messagebox.showerror("Hata", f"Sonuçlar kaydedilirken hata: {str(e)}")
@@ -0,0 +1,272 @@
+# model_registry.py
+import threading
+import time
+from collections import namedtuple
+
+TrOCRHandle = namedtuple("TrOCRHandle", ["processor", "model", "device"])
+
+
+def current_rss_mb():
+    """Sürecin bellek kullanımını MB olarak döndür (ölçülemezse None)"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        pass
+
+    try:
+        import resource
+        import sys
+        # Linux'ta KB, macOS'ta byte cinsinden tepe değer
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        return None
+
+
+class ModelRegistry:
+    """OCR modellerini süreç başına bir kez yükleyip paylaşan kayıt"""
+
+    TROCR_MODEL_NAME = "microsoft/trocr-base-printed"
+    # ocr_settings.model_type ile seçilen TrOCR çalıştırma biçimleri
+    TROCR_BACKENDS = ("trocr", "trocr-int8", "trocr-onnx")
+    # ONNX dışa aktarımı bir kez yapılıp burada saklanır
+    TROCR_ONNX_DIR = "models/trocr-base-printed-onnx"
+    TESSERACT_CMD = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+
+    def __init__(self):
+        self._handles = {}
+        self._stats = {}
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def _engine_lock(self, name):
+        with self._locks_guard:
+            if name not in self._locks:
+                self._locks[name] = threading.Lock()
+            return self._locks[name]
+
+    def _get_or_load(self, name, loader):
+        """Motoru ilk istekte yükle, sonrakilerde paylaşılan örneği döndür"""
+        if name in self._handles:
+            return self._handles[name]
+
+        with self._engine_lock(name):
+            # Kilidi beklerken başka bir thread yüklemiş olabilir
+            if name in self._handles:
+                return self._handles[name]
+
+            rss_before = current_rss_mb()
+            start = time.perf_counter()
+            handle = loader()
+            load_seconds = time.perf_counter() - start
+            rss_after = current_rss_mb()
+
+            rss_delta = None
+            if rss_before is not None and rss_after is not None:
+                rss_delta = round(rss_after - rss_before, 1)
+
+            self._stats[name] = {
+                "loaded": bool(handle),
+                "load_seconds": round(load_seconds, 2),
+                "rss_delta_mb": rss_delta
+            }
+            print(f"{name} yükleme süresi: {load_seconds:.2f} sn, bellek artışı: {rss_delta} MB")
+
+            self._handles[name] = handle
+            return handle
+
+    def get_trocr(self, backend="trocr"):
+        """Paylaşılan TrOCR işlemci ve modelini döndür
+
+        backend: "trocr" (fp32 PyTorch), "trocr-int8" (dinamik int8 kuantize,
+        CPU) veya "trocr-onnx" (ONNX Runtime)
+        """
+        if backend not in self.TROCR_BACKENDS:
+            print(f"Bilinmeyen TrOCR backend'i '{backend}', 'trocr' kullanılıyor")
+            backend = "trocr"
+
+        loaders = {
+            "trocr": self._load_trocr,
+            "trocr-int8": self._load_trocr_int8,
+            "trocr-onnx": self._load_trocr_onnx
+        }
+        return self._get_or_load(self.trocr_name(backend), loaders[backend])
+
+    def trocr_name(self, backend="trocr"):
+        """Backend'in kayıttaki adı (varsayılan backend önceki sürümlerle aynı adla kaydedilir)"""
+        if backend == "trocr" or backend not in self.TROCR_BACKENDS:
+            return "trocr"
+        return f"trocr:{backend}"
+
+    def get_easyocr_reader(self):
+        """Paylaşılan EasyOCR Reader örneğini döndür"""
+        return self._get_or_load("easyocr", self._load_easyocr)
+
+    def is_tesseract_available(self):
+        """Tesseract'ın kullanılabilir olup olmadığını döndür (bir kez denenir)"""
+        return self._get_or_load("tesseract", self._probe_tesseract)
+
+    def is_loaded(self, name):
+        """Motor yüklendi mi (yükleme denemesi bitti mi)"""
+        return name in self._handles
+
+    def availability(self, name):
+        """Motor kullanılabilir mi - yükleme denemesi bitmediyse None (yüklemeyi beklemez)"""
+        if name not in self._handles:
+            return None
+        return bool(self._handles[name])
+
+    def warmup(self, engines=("trocr", "tesseract", "easyocr"), on_ready=None, trocr_backend="trocr"):
+        """Motorları arka plan thread'inde önceden yükle
+
+        Yükleme sürerken bir motoru isteyen kod yalnızca o motorun
+        kilidinde bekler; diğer motorların yüklenmesini beklemez.
+        """
+        loaders = {
+            "trocr": lambda: self.get_trocr(trocr_backend),
+            "easyocr": self.get_easyocr_reader,
+            "tesseract": self.is_tesseract_available
+        }
+
+        def run():
+            for name in engines:
+                try:
+                    loaders[name]()
+                except Exception as e:
+                    print(f"{name} arka planda yüklenemedi: {e}")
+            if on_ready:
+                on_ready()
+
+        thread = threading.Thread(target=run, name="ocr-model-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def report(self):
+        """Yüklenen motorların süre ve bellek bilgilerini döndür"""
+        return {
+            "engines": {name: dict(stats) for name, stats in self._stats.items()},
+            "rss_mb": current_rss_mb()
+        }
+
+    def _load_trocr(self):
+        try:
+            import torch
+            from transformers import TrOCRProcessor, VisionEncoderDecoderModel
+
+            print(f"TrOCR yükleniyor: {self.TROCR_MODEL_NAME}")
+            device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+
+            processor = TrOCRProcessor.from_pretrained(self.TROCR_MODEL_NAME)
+            model = VisionEncoderDecoderModel.from_pretrained(self.TROCR_MODEL_NAME)
+            model.to(device)
+            model.eval()
+
+            print(f"✓ TrOCR başarıyla yüklendi ({device})")
+            return TrOCRHandle(processor, model, device)
+
+        except Exception as e:
+            print(f"✗ TrOCR yüklenemedi: {e}")
+            return None
+
+    def _load_trocr_int8(self):
+        """Linear katmanları dinamik int8 kuantize edilmiş TrOCR (yalnızca CPU)"""
+        try:
+            import torch
+            from transformers import TrOCRProcessor, VisionEncoderDecoderModel
+
+            print(f"TrOCR (int8) yükleniyor: {self.TROCR_MODEL_NAME}")
+            device = torch.device('cpu')
+
+            processor = TrOCRProcessor.from_pretrained(self.TROCR_MODEL_NAME)
+            model = VisionEncoderDecoderModel.from_pretrained(self.TROCR_MODEL_NAME)
+            model.eval()
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+            print("✓ TrOCR int8 kuantize edildi (cpu)")
+            return TrOCRHandle(processor, model, device)
+
+        except Exception as e:
+            print(f"✗ TrOCR int8 yüklenemedi: {e}")
+            return None
+
+    def _load_trocr_onnx(self):
+        """Encoder/decoder'ı ONNX Runtime ile çalışan TrOCR"""
+        try:
+            import os
+            import torch
+            from optimum.onnxruntime import ORTModelForVision2Seq
+            from transformers import TrOCRProcessor
+
+            processor = TrOCRProcessor.from_pretrained(self.TROCR_MODEL_NAME)
+
+            if os.path.isdir(self.TROCR_ONNX_DIR):
+                print(f"TrOCR (ONNX) yükleniyor: {self.TROCR_ONNX_DIR}")
+                model = ORTModelForVision2Seq.from_pretrained(self.TROCR_ONNX_DIR)
+            else:
+                # İlk kullanımda dışa aktar ve sonraki açılışlar için sakla
+                print(f"TrOCR ONNX'e aktarılıyor: {self.TROCR_MODEL_NAME}")
+                model = ORTModelForVision2Seq.from_pretrained(self.TROCR_MODEL_NAME, export=True)
+                model.save_pretrained(self.TROCR_ONNX_DIR)
+
+            print("✓ TrOCR ONNX Runtime ile yüklendi (cpu)")
+            return TrOCRHandle(processor, model, torch.device('cpu'))
+
+        except Exception as e:
+            print(f"✗ TrOCR ONNX yüklenemedi: {e}")
+            return None
+
+    def _load_easyocr(self):
+        try:
+            import easyocr
+        except ImportError as e:
+            print(f"EasyOCR bulunamadı: {e}")
+            return None
+
+        # GPU yoksa boşuna GPU denemesi yapma
+        try:
+            import torch
+            gpu_available = torch.cuda.is_available()
+        except ImportError:
+            gpu_available = False
+
+        if gpu_available:
+            try:
+                # Türkçe ve İngilizce desteği
+                reader = easyocr.Reader(['tr', 'en'], gpu=True)
+                print("EasyOCR başarıyla yüklendi")
+                return reader
+            except Exception as e:
+                print(f"EasyOCR GPU ile yüklenemedi: {e}")
+
+        try:
+            reader = easyocr.Reader(['tr', 'en'], gpu=False)
+            print("EasyOCR CPU modunda yüklendi")
+            return reader
+        except Exception as e:
+            print(f"EasyOCR hiç yüklenemedi: {e}")
+            return None
+
+    def _probe_tesseract(self):
+        try:
+            import pytesseract
+            from PIL import Image
+
+            pytesseract.pytesseract.tesseract_cmd = self.TESSERACT_CMD
+            # Test et
+            test_image = Image.new('RGB', (100, 30), color='white')
+            pytesseract.image_to_string(test_image)
+            print("✓ Tesseract hazır")
+            return True
+        except Exception:
+            print("✗ Tesseract bulunamadı")
+            return False
+
+
+# Süreç genelinde paylaşılan kayıt
+_default_registry = ModelRegistry()
+
+
+def get_registry():
+    """Süreç genelindeki varsayılan model kaydını döndür"""
+    return _default_registry
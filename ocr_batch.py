@@ -0,0 +1,283 @@
+# ocr_batch.py
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import Pool
+
+from config_manager import ConfigManager
+from form_pipeline import SUPPORTED_EXTENSIONS, create_pipeline, output_field_names, pipeline_settings
+from ocr_metrics import METRICS, profile_call, timer
+from result_sinks import create_sink, default_output_path
+from run_manifest import RunManifest, file_digest, template_version
+
+# Çıktı en az bu aralıkla kalıcı hale getirilip ilerleme kaydına işlenir
+CHECKPOINT_SECONDS = 30
+
+# İşçi süreç başına bir kez oluşturulan akış
+_worker_pipeline = None
+
+
+def _init_worker(settings, use_ensemble, threads_per_worker):
+    """İşçi süreci hazırla - modeller süreç başına bir kez yüklenir"""
+    global _worker_pipeline
+
+    if threads_per_worker:
+        # Süreçler çekirdekleri paylaşırken torch'un aşırı thread açmasını engelle
+        import torch
+        torch.set_num_threads(threads_per_worker)
+
+    # Disk katmanı açıksa işçiler aynı önbellek dosyasını paylaşır;
+    # şablon öznitelikleri işçi başına bir kez çıkarılır
+    _worker_pipeline = create_pipeline(settings, use_ensemble)
+
+
+def process_file(file_path):
+    """Tek bir form dosyasını işle (işçi süreçte çalışır)
+
+    Form başına bir kayıt ve bu dosya sırasında toplanan aşama ölçümleri
+    döner; ölçümler ana süreçte birleştirilir.
+    """
+    records = _worker_pipeline.process_file(file_path)
+    return records, METRICS.snapshot(reset=True)
+
+
+def collect_input_files(input_dir):
+    """Klasördeki desteklenen form dosyalarını sıralı olarak topla"""
+    files = []
+    for entry in sorted(os.scandir(input_dir), key=lambda e: e.name):
+        if entry.is_file() and entry.name.lower().endswith(SUPPORTED_EXTENSIONS):
+            files.append(entry.path)
+    return files
+
+
+def default_manifest_path(output_format, out_path):
+    """Çıktının yanındaki ilerleme kaydı (json biçiminde çıktı klasörünün içinde)
+
+    Ad uzantısıyla birlikte çıktı dosyasından türetilir; results.jsonl ile
+    results.csv aynı kaydı paylaşıp birbirinin dosyalarını atlatmaz.
+    """
+    if output_format == "json":
+        return os.path.join(out_path, "ocr_manifest.sqlite")
+    return out_path + ".manifest.sqlite"
+
+
+def checkpoint(sink, manifest, unrecorded):
+    """Çıktıyı boşalt, ardından dosyaları ilerleme kaydına işle
+
+    Dosya ancak sonuçları çıktıya yazıldıktan sonra tamamlandı sayılır;
+    arada kesilen çalışmada bu dosyalar yeniden işlenir.
+    """
+    with timer("write"):
+        sink.flush()
+    manifest.record_files(unrecorded)
+    unrecorded.clear()
+
+
+def profile_form(settings, use_ensemble, file_path, output):
+    """Tek formu cProfile altında işle; model yükleme profile dahil edilmez"""
+    pipeline = create_pipeline(settings, use_ensemble)
+    _, stats = profile_call(pipeline.process_file, file_path, output=output)
+    print(stats)
+    print(f"{os.path.basename(file_path)} profili {output} dosyasına yazıldı")
+    # Profil çalışmasının ölçümleri toplu çalışmanınkilere karışmasın
+    METRICS.reset()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m ocr_batch",
+        description="Form klasörünü arayüz olmadan toplu OCR'dan geçir"
+    )
+    parser.add_argument("--template", default="form_config.json",
+                        help="Alan koordinatlarını içeren konfigürasyon dosyası")
+    parser.add_argument("--input", required=True, help="Form dosyalarının bulunduğu klasör")
+    parser.add_argument("--out", default=None,
+                        help="Sonuçların yazılacağı dosya (varsayılan: output_settings.path veya results.<biçim>)")
+    parser.add_argument("--format", choices=("jsonl", "csv", "sqlite", "json"), default=None,
+                        help="Çıktı biçimi (varsayılan: output_settings.format; form başına json yerine jsonl)")
+    parser.add_argument("--manifest", default=None,
+                        help="İlerleme kaydı (varsayılan: <out>.manifest.sqlite); yarıda kalan çalışma "
+                             "aynı kayıtla başlatılınca tamamlanan dosyalar atlanır")
+    parser.add_argument("--restart", action="store_true",
+                        help="İlerleme kaydını yok sayıp tüm dosyaları baştan işle")
+    parser.add_argument("--truncate", action="store_true",
+                        help="Çıktıdaki önceki sonuçları silip baştan başla, --restart'ı da içerir "
+                             "(varsayılan: sonuçlar var olan çıktıya eklenir)")
+    parser.add_argument("--max-attempts", type=int, default=3,
+                        help="Hatalı bir dosyanın en fazla kaç çalışmada yeniden deneneceği")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="İşçi süreç sayısı")
+    parser.add_argument("--threads-per-worker", type=int, default=None,
+                        help="Her işçideki torch thread sayısı (varsayılan: çekirdek / işçi)")
+    parser.add_argument("--model-type", choices=("trocr", "trocr-int8", "trocr-onnx"), default=None,
+                        help="TrOCR çalıştırma biçimi (varsayılan: ocr_settings.model_type)")
+    parser.add_argument("--ensemble", action="store_true",
+                        help="TrOCR yerine EnsembleOCR kullan")
+    parser.add_argument("--ensemble-mode", choices=("all", "cascade"), default=None,
+                        help="Ensemble modu (varsayılan: ocr_settings.ensemble_mode)")
+    parser.add_argument("--full-page", action="store_true",
+                        help="EasyOCR'ı sayfa başına bir kez çalıştırıp alanlara dağıt")
+    parser.add_argument("--pdf-dpi", type=int, default=None,
+                        help="PDF sayfalarının çizim çözünürlüğü (varsayılan: şablon çözünürlüğü)")
+    parser.add_argument("--no-text-layer", action="store_true",
+                        help="Dijital PDF'lerin metin katmanını kullanmadan her alanı OCR'la")
+    parser.add_argument("--full-pdf-page", action="store_true",
+                        help="PDF'de yalnızca alanları kapsayan bölge yerine tüm sayfayı çiz")
+    parser.add_argument("--template-image", default=None,
+                        help="Sayfaların hizalanacağı şablon resmi (varsayılan: registration_settings)")
+    parser.add_argument("--no-align", action="store_true", help="Form hizalamasını kapat")
+    parser.add_argument("--templates", default=None,
+                        help="Her sayfa için en yakın şablonun seçileceği şablon kütüphanesi klasörü")
+    parser.add_argument("--cache-db", default=None,
+                        help="İşçiler arasında paylaşılan SQLite sonuç önbelleği")
+    parser.add_argument("--no-cache", action="store_true", help="Sonuç önbelleğini kapat")
+    parser.add_argument("--metrics-out", default=None,
+                        help="Aşama süre histogramlarının yazılacağı dosya (.prom: Prometheus, diğerleri: JSON)")
+    parser.add_argument("--profile", default=None, metavar="PROF_DOSYASI",
+                        help="İlk dosyayı ana süreçte cProfile ile işleyip profili bu dosyaya yaz")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    config_manager = ConfigManager(args.template)
+    settings = pipeline_settings(config_manager)
+    coordinates = settings["coordinates"]
+
+    if args.cache_db:
+        settings["cache_settings"]["disk_path"] = args.cache_db
+    if args.no_cache:
+        settings["cache_settings"]["enabled"] = False
+
+    if args.model_type:
+        settings["processor_options"]["model_type"] = args.model_type
+    if args.ensemble_mode:
+        settings["ensemble_options"]["mode"] = args.ensemble_mode
+    if args.full_page:
+        settings["ensemble_options"]["full_page"] = True
+
+    if args.template_image:
+        settings["registration_settings"].update({"enabled": True, "template_image": args.template_image})
+    if args.no_align:
+        settings["registration_settings"]["enabled"] = False
+    if args.templates:
+        settings["library_settings"].update({"enabled": True, "directory": args.templates})
+
+    settings["pdf_options"]["dpi"] = args.pdf_dpi
+    settings["pdf_options"]["render_region"] = not args.full_pdf_page
+    if args.no_text_layer:
+        settings["pdf_options"]["text_layer"] = False
+
+    if not coordinates and not settings["library_settings"]["enabled"]:
+        print(f"{args.template} içinde koordinat tanımlı alan yok")
+        return 1
+
+    # Toplu çalışmada form başına ayrı JSON dosyası yerine tek dosyaya eklenir
+    output_settings = settings["output_settings"]
+    if args.format:
+        output_settings["format"] = args.format
+    elif output_settings["format"] == "json":
+        output_settings["format"] = "jsonl"
+        output_settings["path"] = None
+    if args.out:
+        output_settings["path"] = args.out
+    out_path = output_settings["path"] or default_output_path(output_settings["format"])
+
+    files = collect_input_files(args.input)
+    if not files:
+        print(f"{args.input} içinde işlenecek dosya bulunamadı")
+        return 1
+
+    try:
+        sink = create_sink(output_settings, output_field_names(settings), out_path, truncate=args.truncate)
+    except (ValueError, OSError) as e:
+        print(f"Çıktı açılamadı: {e}")
+        return 1
+
+    manifest = RunManifest(args.manifest or default_manifest_path(output_settings["format"], out_path),
+                           template_version(settings))
+    # Silinen veya boş çıktıdaki dosyalar tamamlanmış sayılmamalı
+    if args.restart or args.truncate or not sink.had_results:
+        manifest.reset()
+    resuming = manifest.has_progress()
+
+    # Özetler dosya okuması ağırlıklı, hashlib GIL'i bıraktığı için thread'lerle hızlanır
+    with ThreadPoolExecutor(max_workers=min(8, len(files))) as hasher:
+        hashes = dict(zip(files, hasher.map(file_digest, files)))
+
+    completed = manifest.completed()
+    attempts = manifest.attempts()
+    exhausted = [path for path in files if attempts.get(hashes[path], 0) >= args.max_attempts]
+    all_files = files
+    files = [path for path in files if hashes[path] not in completed and path not in exhausted]
+
+    if resuming:
+        print(f"Önceki çalışmadan devam ediliyor: {len(all_files) - len(files) - len(exhausted)} dosya "
+              f"tamamlanmış, {len(exhausted)} dosya deneme sınırına ulaşmış")
+    if not files:
+        print("İşlenecek yeni dosya yok")
+        sink.close()
+        manifest.close()
+        return 0 if not exhausted else 2
+
+    workers = max(1, min(args.workers, len(files)))
+    threads_per_worker = args.threads_per_worker
+    if threads_per_worker is None:
+        threads_per_worker = max(1, (os.cpu_count() or 1) // workers)
+
+    if args.profile:
+        profile_form(settings, args.ensemble, files[0], args.profile)
+
+    print(f"{len(files)} dosya, {workers} işçi süreçle işleniyor...")
+    start = time.perf_counter()
+    forms = 0
+    failed = 0
+
+    # Çıktıdaki önceki sonuçlar --truncate verilmedikçe korunur; yeniden
+    # denenen dosyanın kayıtları sona eklenir (aynı dosya/sayfa için son kayıt geçerlidir).
+    # Çıktı batch_size form veya CHECKPOINT_SECONDS dolunca topluca boşaltılır.
+    unrecorded = []
+    last_checkpoint = time.perf_counter()
+
+    with sink, Pool(workers, initializer=_init_worker,
+                    initargs=(settings, args.ensemble, threads_per_worker)) as pool:
+        for done, (records, metrics) in enumerate(pool.imap_unordered(process_file, files), start=1):
+            METRICS.merge(metrics)
+            with timer("write"):
+                sink.write_many(records)
+            unrecorded.append((hashes[records[0]["file"]], records[0]["file"], records))
+
+            if (sum(len(entry[2]) for entry in unrecorded) >= output_settings["batch_size"]
+                    or time.perf_counter() - last_checkpoint >= CHECKPOINT_SECONDS):
+                checkpoint(sink, manifest, unrecorded)
+                last_checkpoint = time.perf_counter()
+
+            for record in records:
+                forms += 1
+                if record["error"]:
+                    failed += 1
+                    print(f"✗ {record['file']} (sayfa {record['page']}): {record['error']}")
+
+            print(f"[{done}/{len(files)}] {os.path.basename(records[0]['file'])} "
+                  f"({len(records)} form, {sum(r['elapsed'] for r in records):.3f} sn)")
+
+        checkpoint(sink, manifest, unrecorded)
+
+    elapsed = time.perf_counter() - start
+    summary = manifest.summary()
+    manifest.close()
+    print(f"İlerleme kaydı: dosyalar {summary['files']}, alanlar {summary['fields']}")
+    METRICS.print_report()
+    if args.metrics_out:
+        METRICS.write(args.metrics_out)
+        print(f"Aşama ölçümleri {args.metrics_out} dosyasına yazıldı")
+    print(f"Tamamlandı: {forms - failed} başarılı, {failed} hatalı form, "
+          f"{elapsed:.1f} sn ({forms / elapsed:.2f} form/sn)")
+    return 0 if not failed and not exhausted else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
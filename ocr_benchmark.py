@@ -0,0 +1,316 @@
+# ocr_benchmark.py
+import argparse
+import datetime
+import json
+import os
+import random
+import sys
+import time
+
+from PIL import Image, ImageDraw, ImageFont
+
+from config_manager import ConfigManager
+from ocr_metrics import METRICS
+
+# Sentetik form düzeni (piksel)
+PAGE_SIZE = (1240, 1754)
+MARGIN = 60
+ROW_HEIGHT = 100
+LABEL_WIDTH = 470
+BOX_HEIGHT = 56
+FONT_SIZE = 30
+
+FIRST_NAMES = ["Ahmet", "Ayşe", "Mehmet", "Fatma", "Mustafa", "Emine", "Hüseyin", "Hatice",
+               "İbrahim", "Zeynep", "Çağrı", "Gülşen", "Özge", "Şükrü", "Ümit", "İlkay"]
+LAST_NAMES = ["Yılmaz", "Kaya", "Demir", "Şahin", "Çelik", "Yıldız", "Öztürk", "Aydın",
+              "Arslan", "Doğan", "Kılıç", "Aslan", "Çetin", "Koç", "Kurt", "Özdemir"]
+BANKS = ["Ziraat Bankası", "İş Bankası", "Garanti BBVA", "Akbank", "Yapı Kredi",
+         "Halkbank", "VakıfBank", "QNB", "Denizbank", "TEB"]
+REASONS = ["Ürün iade edildi", "Çift çekim yapıldı", "Sipariş iptal edildi",
+           "Hizmet alınmadı", "Yanlış tutar çekildi", "Üyelik iptali"]
+
+# Türkçe karakter içeren TrueType fontlar (ilk bulunan kullanılır)
+FONT_CANDIDATES = ["DejaVuSans.ttf", "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+                   "arial.ttf", "C:/Windows/Fonts/arial.ttf", "/Library/Fonts/Arial.ttf"]
+
+
+def load_font(size=FONT_SIZE):
+    for candidate in FONT_CANDIDATES:
+        try:
+            return ImageFont.truetype(candidate, size)
+        except OSError:
+            continue
+    print("TrueType font bulunamadı, varsayılan font kullanılıyor (Türkçe karakterler eksik çizilebilir)")
+    return ImageFont.load_default()
+
+
+def turkish_iban(rng):
+    """Geçerli kontrol haneli rastgele TR IBAN"""
+    bban = f"{rng.randint(0, 99999):05d}0{rng.randint(0, 10 ** 16 - 1):016d}"
+    # Ülke kodu ve "00" sona alınır, harfler sayıya çevrilir (T=29, R=27)
+    check = 98 - int(bban + "292700") % 97
+    iban = f"TR{check:02d}{bban}"
+    return ' '.join(iban[i:i + 4] for i in range(0, len(iban), 4))
+
+
+def random_amount(rng):
+    value = rng.randint(100, 2500000)
+    lira, kurus = divmod(value, 100)
+    return f"{lira:,}".replace(',', '.') + f",{kurus:02d}"
+
+
+def random_date(rng):
+    day = datetime.date(2023, 1, 1) + datetime.timedelta(days=rng.randint(0, 700))
+    return day.strftime("%d.%m.%Y")
+
+
+def random_field_values(rng, fields):
+    """Alan adlarına uygun rastgele değerler üret"""
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    card = ''.join(str(rng.randint(0, 9)) for _ in range(16))
+    amount = random_amount(rng)
+    ascii_name = name.translate(str.maketrans("çğıöşüÇĞİÖŞÜ ", "cgiosuCGIOSU.")).lower()
+
+    values = {
+        "Ad Soyad": name,
+        "Cep Telefonu Numarası": "05" + ''.join(str(rng.randint(0, 9)) for _ in range(9)),
+        "E-Posta Adresi": f"{ascii_name}@example.com",
+        "PARAM Hesap & Kart Numarası": card,
+        "Kart üzerindeki Ad Soyad": name.replace('i', 'İ').upper(),
+        "Kart Numarasının Son 4 Hanesi": card[-4:],
+        "Kartın Ait Olduğu Banka": rng.choice(BANKS),
+        "IBAN Numarası": turkish_iban(rng),
+        "IBAN Sahibinin Ad Soyadı": name,
+        "İşlem Tarihi": random_date(rng),
+        "İşlem Tutarı": amount,
+        "İade Edilecek Tutar": amount,
+        "İptal & İade Nedeni": rng.choice(REASONS),
+        "Tarih": random_date(rng)
+    }
+    return {field: values.get(field, name) for field in fields}
+
+
+def form_layout(fields):
+    """default_fields sırasıyla alt alta dizilmiş değer kutularının koordinatları"""
+    coordinates = {}
+    for row, field in enumerate(fields):
+        top = MARGIN + row * ROW_HEIGHT
+        coordinates[field] = [MARGIN + LABEL_WIDTH, top, PAGE_SIZE[0] - MARGIN, top + BOX_HEIGHT]
+    return coordinates
+
+
+def render_form(values, coordinates, font, rng=None):
+    """Etiketleri ve değerleri çizilmiş form resmi"""
+    image = Image.new('RGB', PAGE_SIZE, 'white')
+    draw = ImageDraw.Draw(image)
+
+    for field, (x1, y1, x2, y2) in coordinates.items():
+        draw.text((MARGIN, y1 + 12), f"{field}:", fill='black', font=font)
+        draw.rectangle((x1, y1, x2, y2), outline='black', width=2)
+        # Tarama benzeri küçük kaymalar
+        jitter = rng.randint(-3, 3) if rng else 0
+        draw.text((x1 + 12 + jitter, y1 + 12 + jitter), values[field], fill='black', font=font)
+
+    return image
+
+
+def generate_forms(count, seed=0):
+    """[(resim, {alan: doğru_değer})] listesi ve ortak koordinatlar"""
+    # Yalnızca varsayılan alan listesi ve veri tipleri kullanılır, dosya okunmaz
+    config_manager = ConfigManager()
+    fields = config_manager.default_fields
+
+    rng = random.Random(seed)
+    font = load_font()
+    coordinates = form_layout(fields)
+
+    forms = []
+    for _ in range(count):
+        values = random_field_values(rng, fields)
+        forms.append((render_form(values, coordinates, font, rng), values))
+    return forms, coordinates, config_manager
+
+
+def percentile(values, pct):
+    """En yakın sıra yöntemiyle yüzdelik"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def peak_rss_mb():
+    """Sürecin şimdiye kadarki en yüksek bellek kullanımı (MB)"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+    except ImportError:
+        from model_registry import current_rss_mb
+        rss = current_rss_mb()
+        return round(rss, 1) if rss is not None else None
+
+
+def stage_report(latencies, fields, seconds, references, hypotheses):
+    # trocr_parity torch'u içe aktarır; main ortam değişkenlerini ayarlamadan önce yüklenmemeli
+    from trocr_parity import character_error_rate
+
+    cer_values = [character_error_rate(ref, hyp.strip()) for ref, hyp in zip(references, hypotheses)]
+    return {
+        "fields": fields,
+        "seconds": round(seconds, 3),
+        "fields_per_sec": round(fields / seconds, 3) if seconds else None,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1) if latencies else None,
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1) if latencies else None,
+        "cer": round(sum(cer_values) / len(cer_values), 4) if cer_values else None,
+        "exact_match": round(sum(ref == hyp.strip() for ref, hyp in zip(references, hypotheses))
+                             / max(len(references), 1), 4),
+        "peak_rss_mb": peak_rss_mb(),
+        # Ölçülen çağrıların iç aşamalara dağılımı
+        "breakdown": METRICS.summary()
+    }
+
+
+def bench_per_field(extract, forms, coordinates, field_settings, field_profile):
+    """Her alan için ayrı çağrı (extract_text / extract_text_ensemble)"""
+    METRICS.reset()
+    latencies, references, hypotheses = [], [], []
+    start = time.perf_counter()
+    for image, values in forms:
+        for field, (x1, y1, x2, y2) in coordinates.items():
+            crop = image.crop((x1, y1, x2, y2))
+            data_type, max_chars = field_profile(field_settings, field)
+            field_start = time.perf_counter()
+            text = extract(crop, data_type=data_type, max_chars=max_chars)
+            latencies.append(time.perf_counter() - field_start)
+            references.append(values[field])
+            hypotheses.append(text)
+    return stage_report(latencies, len(references), time.perf_counter() - start, references, hypotheses)
+
+
+def bench_batch(processor, forms, coordinates, field_settings):
+    """Form başına tek batch_extract çağrısı; gecikme form başınadır"""
+    METRICS.reset()
+    latencies, references, hypotheses = [], [], []
+    start = time.perf_counter()
+    for image, values in forms:
+        form_start = time.perf_counter()
+        results = processor.batch_extract(image, coordinates, field_settings=field_settings)
+        latencies.append(time.perf_counter() - form_start)
+        for field in coordinates:
+            references.append(values[field])
+            hypotheses.append(results.get(field, ""))
+    return stage_report(latencies, len(references), time.perf_counter() - start, references, hypotheses)
+
+
+def compare_reports(previous, current):
+    """İki rapor arasındaki aşama farklarını yazdır"""
+    for stage, metrics in current["stages"].items():
+        before = previous.get("stages", {}).get(stage)
+        if not before:
+            continue
+        parts = []
+        for key in ("fields_per_sec", "p50_ms", "p95_ms", "cer", "peak_rss_mb"):
+            if before.get(key) is not None and metrics.get(key) is not None:
+                parts.append(f"{key} {before[key]} -> {metrics[key]}")
+        print(f"{stage}: " + ", ".join(parts))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m ocr_benchmark",
+        description="Sentetik iade formlarıyla hız ve doğruluk ölçümü (çevrimdışı, CPU)"
+    )
+    parser.add_argument("--forms", type=int, default=5, help="Üretilecek sentetik form sayısı")
+    parser.add_argument("--seed", type=int, default=0, help="Rastgele değer tohumu")
+    parser.add_argument("--stages", default="extract_text,batch_extract,extract_text_ensemble",
+                        help="Virgülle ayrılmış ölçülecek aşamalar")
+    parser.add_argument("--model-type", choices=("trocr", "trocr-int8", "trocr-onnx"), default="trocr")
+    parser.add_argument("--threads", type=int, default=None, help="torch thread sayısı")
+    parser.add_argument("--out", default="benchmark.json", help="Raporun yazılacağı JSON dosyası")
+    parser.add_argument("--compare", default=None, help="Karşılaştırılacak önceki rapor")
+    parser.add_argument("--save-forms", default=None, help="Üretilen formların kaydedileceği klasör")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    # Ölçüm ağ ve GPU'dan bağımsız olmalı: modeller yerel önbellekten, CPU'da çalışır
+    os.environ["CUDA_VISIBLE_DEVICES"] = ""
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+    import torch
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    from ocr_processor import OCRProcessor
+
+    forms, coordinates, config_manager = generate_forms(args.forms, args.seed)
+    field_settings = {
+        field: {"data_type": config_manager.default_data_types.get(field, "text"),
+                "max_length": config_manager.default_max_lengths.get(field)}
+        for field in coordinates
+    }
+    if args.save_forms:
+        os.makedirs(args.save_forms, exist_ok=True)
+        for index, (image, values) in enumerate(forms):
+            image.save(os.path.join(args.save_forms, f"form_{index:03d}.png"))
+            with open(os.path.join(args.save_forms, f"form_{index:03d}.json"), 'w', encoding='utf-8') as f:
+                json.dump(values, f, ensure_ascii=False, indent=2)
+
+    stages = [stage.strip() for stage in args.stages.split(',') if stage.strip()]
+    # Önbellek kapalı: her çağrı gerçekten OCR çalıştırır
+    processor = OCRProcessor(cache=None, model_type=args.model_type)
+    if not processor.model:
+        print("TrOCR yüklenemedi; model yerel önbellekte olmalı (çevrimdışı çalışma)")
+        return 1
+
+    report = {
+        "created": datetime.datetime.now().isoformat(),
+        "settings": {"forms": args.forms, "seed": args.seed, "model_type": args.model_type,
+                     "torch_threads": torch.get_num_threads(), "fields_per_form": len(coordinates)},
+        "stages": {}
+    }
+
+    if "extract_text" in stages:
+        print("extract_text ölçülüyor...")
+        report["stages"]["extract_text"] = bench_per_field(
+            processor.extract_text, forms, coordinates, field_settings, processor.field_profile
+        )
+
+    if "batch_extract" in stages:
+        print("batch_extract ölçülüyor...")
+        report["stages"]["batch_extract"] = bench_batch(processor, forms, coordinates, field_settings)
+
+    if "extract_text_ensemble" in stages:
+        try:
+            from ensemble_ocr import EnsembleOCR
+            ensemble = EnsembleOCR(trocr_processor=processor, cache=None)
+            print("extract_text_ensemble ölçülüyor...")
+            report["stages"]["extract_text_ensemble"] = bench_per_field(
+                ensemble.extract_text_ensemble, forms, coordinates, field_settings, processor.field_profile
+            )
+        except ImportError as e:
+            print(f"EnsembleOCR kullanılamıyor, aşama atlandı: {e}")
+
+    report["models"] = processor.registry.report()
+
+    with open(args.out, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    for stage, metrics in report["stages"].items():
+        print(f"{stage}: {metrics['fields_per_sec']} alan/sn, p50 {metrics['p50_ms']} ms, "
+              f"p95 {metrics['p95_ms']} ms, CER {metrics['cer']}, tepe bellek {metrics['peak_rss_mb']} MB")
+    print(f"Rapor {args.out} dosyasına yazıldı")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            compare_reports(json.load(f), report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
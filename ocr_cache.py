@@ -0,0 +1,176 @@
+# ocr_cache.py
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_CACHE_SETTINGS = {
+    "enabled": True,
+    "memory_items": 2048,
+    "disk_path": None,
+    "disk_max_mb": 256
+}
+
+
+def image_cache_key(image, namespace):
+    """Kırpıntı piksellerinden ve motor ayarlarından içerik adresli anahtar üret"""
+    digest = hashlib.sha256()
+    digest.update(namespace.encode('utf-8'))
+    digest.update(f"|{image.mode}|{image.size[0]}x{image.size[1]}|".encode('ascii'))
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+class SQLiteCacheStore:
+    """Boyut sınırlı, en az kullanılanı silen disk önbelleği"""
+
+    # Toplam boyut kontrolü her yazmada değil, bu kadar yazmada bir yapılır
+    EVICTION_CHECK_INTERVAL = 64
+
+    def __init__(self, db_path, max_mb=256):
+        self.db_path = db_path
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._lock = threading.Lock()
+        self._writes_since_check = 0
+
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+
+        # Birden fazla işçi süreç aynı dosyayı paylaşabilir
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS ocr_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "size INTEGER NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_ocr_cache_accessed ON ocr_cache(accessed)")
+        self._conn.commit()
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM ocr_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE ocr_cache SET accessed = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            return row[0]
+
+    def contains(self, key):
+        """Salt okunur varlık kontrolü - erişim zamanı güncellenmez, yazma kilidi alınmaz"""
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM ocr_cache WHERE key = ? LIMIT 1", (key,)).fetchone() is not None
+
+    def put(self, key, value):
+        size = len(key) + len(value.encode('utf-8'))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO ocr_cache (key, value, size, accessed) VALUES (?, ?, ?, ?)",
+                (key, value, size, time.time())
+            )
+            self._conn.commit()
+
+            self._writes_since_check += 1
+            if self._writes_since_check >= self.EVICTION_CHECK_INTERVAL:
+                self._writes_since_check = 0
+                self._evict()
+
+    def _evict(self):
+        """Toplam boyut sınırı aşıldıysa en eski erişilen kayıtları sil"""
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM ocr_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        # Sınırın %90'ına inene kadar sil, her yazmada tekrar silmeye girmemek için
+        target = int(self.max_bytes * 0.9)
+        freed = 0
+        doomed = []
+        for key, size in self._conn.execute("SELECT key, size FROM ocr_cache ORDER BY accessed"):
+            if total - freed <= target:
+                break
+            doomed.append((key,))
+            freed += size
+
+        self._conn.executemany("DELETE FROM ocr_cache WHERE key = ?", doomed)
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class OCRResultCache:
+    """Bellek içi LRU katmanı ve isteğe bağlı SQLite katmanından oluşan OCR sonuç önbelleği"""
+
+    def __init__(self, max_items=2048, disk_path=None, disk_max_mb=256):
+        self.max_items = max_items
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.disk = SQLiteCacheStore(disk_path, disk_max_mb) if disk_path else None
+        self.hits = 0
+        self.misses = 0
+
+    def key_for(self, image, namespace):
+        return image_cache_key(image, namespace)
+
+    def get(self, key):
+        """Önce bellekte, sonra diskte ara"""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return self._memory[key]
+
+        value = self.disk.get(key) if self.disk else None
+
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._remember(key, value)
+            return value
+
+    def contains(self, key):
+        """İsabet sayaçlarını değiştirmeden anahtarın varlığını kontrol et"""
+        with self._lock:
+            if key in self._memory:
+                return True
+        # Erişim zamanı yalnızca gerçek get isabetinde güncellenir
+        return bool(self.disk) and self.disk.contains(key)
+
+    def put(self, key, value):
+        with self._lock:
+            self._remember(key, value)
+        if self.disk:
+            self.disk.put(key, value)
+
+    def _remember(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_items:
+            self._memory.popitem(last=False)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "memory_items": len(self._memory)}
+
+    def close(self):
+        if self.disk:
+            self.disk.close()
+
+
+def create_cache(settings=None):
+    """cache_settings sözlüğünden önbellek oluştur (kapalıysa None)"""
+    merged = dict(DEFAULT_CACHE_SETTINGS)
+    merged.update(settings or {})
+
+    if not merged["enabled"]:
+        return None
+
+    return OCRResultCache(
+        max_items=merged["memory_items"],
+        disk_path=merged["disk_path"],
+        disk_max_mb=merged["disk_max_mb"]
+    )
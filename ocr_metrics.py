@@ -0,0 +1,223 @@
+# ocr_metrics.py
+import bisect
+import cProfile
+import io
+import json
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+
+# Saniye cinsinden histogram üst sınırları (alan kırpmadan tam sayfa ensemble'a kadar)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    """Sabit kovalı süre histogramı (kovalar kümülatif değil, son kova +Inf)"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.bounds = tuple(buckets)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def merge(self, data):
+        """Başka süreçten gelen to_dict() çıktısını ekle"""
+        for index, value in enumerate(data["buckets"]):
+            self.counts[index] += value
+        self.count += data["count"]
+        self.sum += data["sum"]
+        self.max = max(self.max, data["max"])
+
+    def quantile(self, q):
+        """Kovalardan doğrusal aradeğerle tahmini yüzdelik"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, value in enumerate(self.counts):
+            if value and seen + value >= rank:
+                lower = self.bounds[index - 1] if index > 0 else 0.0
+                upper = self.bounds[index] if index < len(self.bounds) else self.max
+                return min(lower + (upper - lower) * (rank - seen) / value, self.max)
+            seen += value
+        return self.max
+
+    def to_dict(self):
+        return {"buckets": list(self.counts), "count": self.count, "sum": self.sum, "max": self.max}
+
+
+class MetricsRegistry:
+    """Aşama süreleri ve olay sayaçları
+
+    timer("preprocess") gibi bağlamlar süreyi aşama (ve etiket) başına
+    histograma ekler. Sonuçlar JSON veya Prometheus metin biçiminde dışa
+    aktarılır; çok süreçli çalışmada işçi anlık görüntüleri merge() ile
+    birleştirilir.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, prefix="ocr"):
+        self.buckets = tuple(buckets)
+        self.prefix = prefix
+        self.enabled = True
+        self._histograms = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def observe(self, stage, seconds, **labels):
+        if not self.enabled:
+            return
+        key = self._key(stage, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, stage, **labels):
+        """Bloğun süresini aşama histogramına ekle (hata olsa da)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start, **labels)
+
+    def increment(self, event, amount=1, **labels):
+        if not self.enabled:
+            return
+        key = self._key(event, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def snapshot(self, reset=False):
+        """Birleştirilebilir ham durum (JSON'a yazılabilir)"""
+        with self._lock:
+            data = {
+                "buckets": list(self.buckets),
+                "stages": [{"stage": stage, "labels": dict(labels), **histogram.to_dict()}
+                           for (stage, labels), histogram in self._histograms.items()],
+                "events": [{"event": event, "labels": dict(labels), "count": count}
+                           for (event, labels), count in self._counters.items()]
+            }
+            if reset:
+                self._histograms.clear()
+                self._counters.clear()
+        return data
+
+    def merge(self, snapshot):
+        """Başka bir süreçteki snapshot() çıktısını ekle"""
+        with self._lock:
+            for entry in snapshot["stages"]:
+                key = self._key(entry["stage"], entry["labels"])
+                if key not in self._histograms:
+                    self._histograms[key] = Histogram(self.buckets)
+                self._histograms[key].merge(entry)
+            for entry in snapshot["events"]:
+                key = self._key(entry["event"], entry["labels"])
+                self._counters[key] = self._counters.get(key, 0) + entry["count"]
+
+    def summary(self):
+        """Okunur özet: {"aşama[etiket=değer]": {count, total_s, mean_ms, p50_ms, p95_ms, max_ms}}"""
+        summary = {}
+        with self._lock:
+            for (stage, labels), histogram in sorted(self._histograms.items()):
+                name = stage + (f"[{','.join(f'{k}={v}' for k, v in labels)}]" if labels else "")
+                summary[name] = {
+                    "count": histogram.count,
+                    "total_s": round(histogram.sum, 3),
+                    "mean_ms": round(histogram.sum / histogram.count * 1000, 2) if histogram.count else None,
+                    "p50_ms": round(histogram.quantile(0.5) * 1000, 2) if histogram.count else None,
+                    "p95_ms": round(histogram.quantile(0.95) * 1000, 2) if histogram.count else None,
+                    "max_ms": round(histogram.max * 1000, 2)
+                }
+        return summary
+
+    def to_json(self):
+        return json.dumps({"summary": self.summary(), "raw": self.snapshot()}, ensure_ascii=False, indent=2)
+
+    def to_prometheus(self):
+        """Prometheus metin biçimi (histogram + sayaç)"""
+        duration = f"{self.prefix}_stage_duration_seconds"
+        events = f"{self.prefix}_events_total"
+        lines = [f"# HELP {duration} OCR akışı aşama süreleri",
+                 f"# TYPE {duration} histogram"]
+
+        with self._lock:
+            for (stage, labels), histogram in sorted(self._histograms.items()):
+                base = _format_labels((("stage", stage),) + labels)
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), histogram.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{duration}_bucket{_format_labels((('stage', stage),) + labels + (('le', le),))} "
+                                 f"{cumulative}")
+                lines.append(f"{duration}_sum{base} {histogram.sum}")
+                lines.append(f"{duration}_count{base} {histogram.count}")
+
+            lines.extend([f"# HELP {events} OCR olay sayaçları (zaman aşımı, hata)",
+                          f"# TYPE {events} counter"])
+            for (event, labels), count in sorted(self._counters.items()):
+                lines.append(f"{events}{_format_labels((('event', event),) + labels)} {count}")
+
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Uzantıya göre (.prom / .txt: Prometheus, diğerleri: JSON) dosyaya yaz"""
+        content = self.to_prometheus() if path.endswith(('.prom', '.txt')) else self.to_json()
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+
+    def print_report(self):
+        for name, values in self.summary().items():
+            print(f"{name}: {values['count']} kez, toplam {values['total_s']} sn, "
+                  f"ort. {values['mean_ms']} ms, p95 {values['p95_ms']} ms")
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    return "{" + ",".join(f'{key}="{_escape_label(value)}"' for key, value in labels) + "}"
+
+
+# Süreç genelinde paylaşılan kayıt
+METRICS = MetricsRegistry()
+
+
+def timer(stage, **labels):
+    """METRICS.timer kısayolu"""
+    return METRICS.timer(stage, **labels)
+
+
+def profile_call(func, *args, output=None, limit=30, **kwargs):
+    """Fonksiyonu cProfile altında çalıştır, (sonuç, kümülatif süreye göre özet) döndür
+
+    output verilirse ham profil snakeviz/pstats için dosyaya yazılır.
+    """
+    profiler = cProfile.Profile()
+    result = profiler.runcall(func, *args, **kwargs)
+
+    if output:
+        profiler.dump_stats(output)
+
+    stream = io.StringIO()
+    pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(limit)
+    return result, stream.getvalue()
@@ -1,111 +1,411 @@
 # ocr_processor.py
+import threading
+
 import torch
-from transformers import TrOCRProcessor, VisionEncoderDecoderModel
-from PIL import Image
+from PIL import Image, ImageOps
 import pdfplumber
 import cv2
 import numpy as np
 import re
+from collections import namedtuple
+
+from model_registry import get_registry
+from ocr_metrics import METRICS, timer
+from tesseract_backend import TesseractBackend
+
+
+# Akışla çizilen PDF sayfası: offset ve scale şablon koordinatlarını resme taşır,
+# text_fields PDF metin katmanından okunan alanları içerir
+RenderedPage = namedtuple("RenderedPage", ["index", "image", "offset", "scale", "text_fields"],
+                          defaults=(None,))
+
+
+def coordinates_region(coordinates_dict, margin=10):
+    """Tüm alanları kapsayan en küçük dikdörtgen (kenar payıyla)"""
+    boxes = [coords for coords in coordinates_dict.values() if coords]
+    if not boxes:
+        return None
+
+    return (
+        max(0, min(box[0] for box in boxes) - margin),
+        max(0, min(box[1] for box in boxes) - margin),
+        max(box[2] for box in boxes) + margin,
+        max(box[3] for box in boxes) + margin
+    )
+
+
+def field_ink(gray, border=3, contrast=60, line_fill=0.95, line_thickness=0.15, min_component=6):
+    """Alan kutusundaki (mürekkep oranı, mürekkep bileşeni sayısı)
+
+    Bileşenler tüm kutuda bulunur ve bütün olarak sayılır; yalnızca
+    tamamı border piksellik kenar şeridinde kalanlar (basılı kutu
+    kenarları) dışarıda bırakılır. Kenar payı sabit piksel olduğundan
+    geniş kutunun kenarına yazılmış kısa değerler de sayılır. Kutunun
+    genişliğinin/yüksekliğinin line_fill kadarını kaplayan satır/sütunlar ve
+    ince bileşenler alt çizgi veya bölme çizgisidir, sayılmaz. Dar kutudaki "1" gibi ince
+    rakamlar kutunun tamamını kaplamadığı için korunur. min_component
+    pikselden küçük bileşenler tarama lekesidir.
+    """
+    height, width = gray.shape[:2]
+    inner = gray[border:height - border, border:width - border]
+    if inner.size == 0:
+        return 0.0, 0
+
+    # Kağıt rengi alanın açık tonlarından alınır; koyu taramalarda da çalışır
+    background = np.percentile(inner, 90)
+    ink = gray < background - contrast
+    # Kutu kenarı ve bölme çizgileri birbirine değip tek bileşen olur;
+    # neredeyse tamamı mürekkep olan satırlar ve iki yanı boş sütun
+    # dizileri önceden silinir. Kenara değen "1"in gövdesi de tam sütundur
+    # ama ayağı/bayrağı yanındaki sütunda kaldığı için silinmez.
+    full_rows = ink.sum(axis=1) >= width * line_fill
+    full_columns = ink.sum(axis=0) >= height * line_fill
+    ink[full_rows, :] = False
+    column_ink = ink.sum(axis=0)
+    x = 0
+    while x < width:
+        if not full_columns[x]:
+            x += 1
+            continue
+        end = x
+        while end + 1 < width and full_columns[end + 1]:
+            end += 1
+        if (x == 0 or column_ink[x - 1] == 0) and (end == width - 1 or column_ink[end + 1] == 0):
+            ink[:, x:end + 1] = False
+        x = end + 1
+
+    count, labels, stats, _ = cv2.connectedComponentsWithStats(ink.view(np.uint8), connectivity=8)
+    component_width, component_height = stats[:, cv2.CC_STAT_WIDTH], stats[:, cv2.CC_STAT_HEIGHT]
+    line = (((component_width >= width * line_fill) & (component_height <= max(2, height * line_thickness))) |
+            ((component_height >= height * line_fill) & (component_width <= max(2, width * line_thickness))))
+
+    # Kenar şeridinin içine uzanan bileşenler (0: arka plan)
+    inside = np.bincount(labels[border:height - border, border:width - border].ravel(), minlength=count) > 0
+    real = inside & ~line & (stats[:, cv2.CC_STAT_AREA] >= min_component)
+    real[0] = False
+    return float(stats[real, cv2.CC_STAT_AREA].sum()) / gray.size, int(real.sum())
+
+
+def map_coordinates(coordinates_dict, offset=(0, 0), scale=1.0):
+    """Şablon koordinatlarını çizilmiş sayfa resminin koordinatlarına çevir"""
+    offset_x, offset_y = offset
+    mapped = {}
+    for field_name, coords in coordinates_dict.items():
+        if coords:
+            x1, y1, x2, y2 = coords
+            mapped[field_name] = [
+                int((x1 - offset_x) * scale),
+                int((y1 - offset_y) * scale),
+                int((x2 - offset_x) * scale),
+                int((y2 - offset_y) * scale)
+            ]
+        else:
+            mapped[field_name] = coords
+    return mapped
 
 
 class OCRProcessor:
-    def __init__(self):
-        self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-        self.processor = None
-        self.model = None
-        self.tesseract_available = False
-        self.load_models()
+    # Alan koordinatlarının çizildiği çözünürlük (pdfplumber to_image varsayılanı)
+    TEMPLATE_DPI = 72
+
+    # Motor davranışı değiştiğinde artırılır - eski önbellek kayıtları geçersiz olur
+    CACHE_VERSION = 4
+
+    # Alan veri tipine göre TrOCR çözümleme ayarları. max_length token
+    # cinsindendir; allowed_chars verilen tiplerde yalnızca bu karakterlerden
+    # oluşan token'lar üretilebilir.
+    DECODING_PROFILES = {
+        "text": {"num_beams": 4, "max_length": 100, "allowed_chars": None},
+        "email": {"num_beams": 4, "max_length": 48, "allowed_chars": None},
+        "iban": {"num_beams": 2, "max_length": 40, "allowed_chars": "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789 "},
+        "digits": {"num_beams": 1, "max_length": 24, "allowed_chars": "0123456789 "},
+        "date": {"num_beams": 1, "max_length": 16, "allowed_chars": "0123456789./- "},
+        "amount": {"num_beams": 1, "max_length": 20, "allowed_chars": "0123456789.,- TLtl₺"}
+    }
+
+    def __init__(self, trocr_batch_size=32, registry=None, lazy=False, cache=None, model_type="trocr",
+                 early_accept_score=None, blank_threshold=None):
+        self._default_device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+        self._trocr = None
+        self._tesseract_available = None
+        # allowed_chars -> izin verilen token id listesi
+        self._allowed_tokens = {}
+        # CLAHE nesneleri thread başına bir kez oluşturulup yeniden kullanılır
+        self._clahe_local = threading.local()
+        # TrOCR çalıştırma biçimi: "trocr", "trocr-int8" veya "trocr-onnx"
+        self.model_type = model_type
+        # Tek generate çağrısına girecek en fazla kırpıntı sayısı
+        self.trocr_batch_size = trocr_batch_size
+        # Ham kırpıntının güveni bu eşiği geçerse ön işlemli hali çözülmez
+        # (None: iki hal de her zaman çözülür)
+        self.early_accept_score = early_accept_score
+        # Gerçek mürekkep bileşeni olmayan alanlar OCR'a gönderilmeden boş
+        # döner; eşik, yükseklik²'ye oranla leke boyutudur. Alan ayarındaki
+        # blank_threshold bunu ezer (None: kontrol yok)
+        self.blank_threshold = blank_threshold
+        # TrOCRBatchScheduler atanırsa kırpıntılar diğer isteklerinkilerle
+        # ortak generate batch'lerinde çözülür (ocr_service)
+        self.scheduler = None
+        # Modeller süreç genelindeki kayıttan paylaşılır, tekrar yüklenmez
+        self.registry = registry or get_registry()
+        # Aynı kırpıntının tekrar OCR'lanmasını önleyen önbellek (isteğe bağlı)
+        self.cache = cache
+        # PSM'i alana göre seçen tek geçişli Tesseract (tesserocr varsa kalıcı API)
+        self.tesseract = TesseractBackend()
+
+        # lazy=True ise modeller ilk kullanımda (veya registry.warmup ile) yüklenir
+        if not lazy:
+            self.load_models()
 
     def load_models(self):
         """OCR modellerini yükle"""
         print("OCR modelleri yükleniyor...")
 
-        # 1. TrOCR yükle
-        try:
-            model_name = "microsoft/trocr-base-printed"
-            print(f"TrOCR yükleniyor: {model_name}")
+        # 1. TrOCR (kayıtta yoksa yüklenir)
+        self._trocr_handle()
 
-            self.processor = TrOCRProcessor.from_pretrained(model_name)
-            self.model = VisionEncoderDecoderModel.from_pretrained(model_name)
-            self.model.to(self.device)
-            self.model.eval()
+        # 2. Tesseract kontrolü (süreç başına bir kez)
+        _ = self.tesseract_available
 
-            print(f"✓ TrOCR başarıyla yüklendi ({self.device})")
+    def _trocr_handle(self):
+        """TrOCR'ı ilk kullanımda kayıttan al - yükleniyorsa yalnızca onu bekler"""
+        if self._trocr is None:
+            self._trocr = self.registry.get_trocr(self.model_type) or False
+        return self._trocr or None
 
-        except Exception as e:
-            print(f"✗ TrOCR yüklenemedi: {e}")
-            self.model = None
+    @property
+    def processor(self):
+        handle = self._trocr_handle()
+        return handle.processor if handle else None
 
-        # 2. Tesseract kontrol et
-        try:
-            import pytesseract
-            pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
-            # Test et
-            test_image = Image.new('RGB', (100, 30), color='white')
-            pytesseract.image_to_string(test_image)
-            self.tesseract_available = True
-            print("✓ Tesseract hazır")
-        except:
-            print("✗ Tesseract bulunamadı")
+    @property
+    def model(self):
+        handle = self._trocr_handle()
+        return handle.model if handle else None
+
+    @property
+    def device(self):
+        handle = self._trocr_handle()
+        return handle.device if handle else self._default_device
+
+    @property
+    def tesseract_available(self):
+        if self._tesseract_available is None:
+            self._tesseract_available = self.registry.is_tesseract_available()
+        return self._tesseract_available
 
     def preprocess_image(self, image):
         """Basit ve etkili ön işleme"""
-        # Numpy array'e çevir
-        img = np.array(image)
+        with timer("preprocess"):
+            gray = self._to_gray(np.asarray(image))
 
-        # Griye çevir
-        if len(img.shape) == 3:
-            gray = cv2.cvtColor(img, cv2.COLOR_RGB2GRAY)
-        else:
-            gray = img
+            # Boyut kontrolü - çok küçükse büyüt
+            gray = self._upscale_small(gray)
+
+            # Gürültü azalt, kontrast artır, binary threshold
+            return self._threshold(self._enhance(gray))
+
+    def preprocess_fields(self, image, coordinates_dict):
+        """Alanları kapsayan bölgeyi bir kez ön işle, alanları bu bölgeden kes
+
+        Gri dönüşüm, gürültü azaltma ve CLAHE bölgede bir kez yapılır;
+        alanlar NumPy görünümü olarak kesilir ve yalnızca büyütme ile Otsu
+        eşiği alan başına uygulanır. Dönüş: {alan_adı: ön işlemli resim}
+        """
+        with timer("preprocess_fields"):
+            return self._preprocess_fields(image, coordinates_dict)
+
+    def _preprocess_fields(self, image, coordinates_dict):
+        views = self._field_views(image, coordinates_dict, lambda region: self._enhance(self._to_gray(region)))
+
+        processed = {}
+        for field_name, view in views.items():
+            try:
+                processed[field_name] = self._threshold(self._upscale_small(view))
+            except Exception as e:
+                print(f"{field_name} ön işleme hatası: {e}")
+
+        return processed
+
+    def _field_views(self, image, coordinates_dict, prepare):
+        """Alanları kapsayan bölgeyi bir kez prepare ile işle, alanları NumPy görünümü olarak kes
+
+        Dönüş: {alan_adı: görünüm}; sayfa dışında kalan alanlar dönmez.
+        """
+        region = coordinates_region(coordinates_dict)
+        if region is None:
+            return {}
+
+        page = np.asarray(image if image.mode in ('RGB', 'L') else image.convert('RGB'))
+        height, width = page.shape[:2]
+        rx1, ry1 = int(region[0]), int(region[1])
+        rx2, ry2 = min(int(region[2]), width), min(int(region[3]), height)
+        if rx2 <= rx1 or ry2 <= ry1:
+            return {}
+
+        prepared = prepare(page[ry1:ry2, rx1:rx2])
+
+        views = {}
+        for field_name, coords in coordinates_dict.items():
+            if not coords:
+                continue
+            x1, y1, x2, y2 = (int(value) for value in coords)
+            view = prepared[max(y1, ry1) - ry1:min(y2, ry2) - ry1, max(x1, rx1) - rx1:min(x2, rx2) - rx1]
+            if view.size:
+                views[field_name] = view
+        return views
+
+    def blank_fields(self, image, coordinates_dict, field_settings=None):
+        """Boş bırakılmış alanların adları
+
+        Alanları kapsayan bölge bir kez griye çevrilir, her alan NumPy
+        görünümü olarak ölçülür. Çizgi olmayan tek bir gerçek mürekkep
+        bileşeni bile alanı dolu sayar; eşik yalnızca bileşenin leke
+        sayılmaması için gereken en küçük alanı (kutu yüksekliğinin
+        karesine oranla) belirler.
+        """
+        thresholds = {}
+        for field_name, coords in coordinates_dict.items():
+            threshold = ((field_settings or {}).get(field_name) or {}).get("blank_threshold")
+            if threshold is None:
+                threshold = self.blank_threshold
+            if coords and threshold:
+                thresholds[field_name] = threshold
+
+        if not thresholds:
+            return set()
+
+        with timer("blank_check"):
+            views = self._field_views(image, {name: coordinates_dict[name] for name in thresholds}, self._to_gray)
 
-        # Boyut kontrolü - çok küçükse büyüt
+            blank = set()
+            for field_name, view in views.items():
+                # Leke eşiği kutu yüksekliğine göre ölçeklenir, genişliğe değil
+                noise = int(thresholds[field_name] * view.shape[0] * view.shape[0])
+                _, components = field_ink(view, min_component=max(6, noise))
+                if components == 0:
+                    blank.add(field_name)
+
+        if blank:
+            METRICS.increment("blank_field_skipped", len(blank))
+        return blank
+
+    def _to_gray(self, img):
+        """Griye çevir (gri girişte kopya yapılmaz)"""
+        if img.ndim == 2:
+            return img
+        if img.shape[2] == 4:
+            return cv2.cvtColor(img, cv2.COLOR_RGBA2GRAY)
+        return cv2.cvtColor(img, cv2.COLOR_RGB2GRAY)
+
+    def _upscale_small(self, gray):
+        """Çok küçük kırpıntıyı büyüt"""
         h, w = gray.shape
         if h < 50 or w < 150:
             scale = max(2, 50 / h, 150 / w)
             new_h, new_w = int(h * scale), int(w * scale)
             gray = cv2.resize(gray, (new_w, new_h), interpolation=cv2.INTER_CUBIC)
+        return gray
 
-        # Gürültü azalt
+    def _enhance(self, gray):
+        """Gürültü azalt ve kontrast artır"""
         denoised = cv2.medianBlur(gray, 3)
+        return self._clahe().apply(denoised)
 
-        # Kontrast artır
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-        enhanced = clahe.apply(denoised)
+    def _clahe(self):
+        clahe = getattr(self._clahe_local, "clahe", None)
+        if clahe is None:
+            clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+            self._clahe_local.clahe = clahe
+        return clahe
 
-        # Binary threshold
+    def _threshold(self, enhanced):
+        """Otsu eşiği uygula, motor girişi olarak PIL resmi döndür"""
         _, binary = cv2.threshold(enhanced, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-
         return Image.fromarray(binary)
 
-    def extract_text(self, image):
-        """Ana OCR fonksiyonu"""
+    def extract_text(self, image, trocr_results=None, tesseract_result=None, data_type=None, max_chars=None,
+                     cache_result=True):
+        """Ana OCR fonksiyonu
+
+        trocr_results verilirse (toplu işlemden gelen TrOCR çıktıları)
+        TrOCR tekrar çalıştırılmaz; tesseract_result verilirse Tesseract da
+        tekrar çalıştırılmaz. data_type ve max_chars alanın çözümleme
+        profilini belirler. cache_result False ise (verilen sonuçlardan biri
+        eksikse) sonuç önbelleğe yazılmaz.
+        """
         if not image:
             return ""
 
+        cache_key = self._cache_key(image, data_type, max_chars)
+        if cache_key:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        text = self._extract_text_uncached(image, trocr_results, tesseract_result, data_type, max_chars)
+
+        # Motorlar bu çağrıda yüklenmiş (veya yüklenemeyip) olabilir; sonuç,
+        # okuma anahtarıyla değil motorların gerçek durumunu taşıyan anahtarla yazılır
+        if cache_key and cache_result:
+            self.cache.put(self._cache_key(image, data_type, max_chars), text)
+        return text
+
+    def cache_namespace(self):
+        """Önbellek anahtarına giren motor ve ayar bilgisi
+
+        Motorlar yüklenmeden ayarlardan kurulur; önbellek isabeti model
+        yüklemesini beklemez. Yükleme denemesi başarısız biten motor anahtara
+        kullanılamaz olarak girer, henüz yüklenmemiş motor kullanılabilir
+        sayılır. Bu yüzden yazma anahtarı motorlar çalıştıktan sonra yeniden
+        hesaplanır: yüklenemeyen motorsuz sonuç, motorları yüklenen
+        süreçlerin okuduğu anahtara yazılmaz. Hiç denenmemiş motor sonucu
+        etkilemediğinden anahtarda kullanılabilir kalması zararsızdır.
+        """
+        trocr_available = self.registry.availability(self.registry.trocr_name(self.model_type)) is not False
+        tesseract_available = self.registry.availability("tesseract") is not False
+        model_name = f"{self.registry.TROCR_MODEL_NAME}:{self.model_type}" if trocr_available else "none"
+        return (f"ocr_processor:v{self.CACHE_VERSION}:{model_name}"
+                f":tesseract={tesseract_available}:{self.tesseract.language}"
+                f":accept={self.early_accept_score}")
+
+    def _cache_key(self, image, data_type=None, max_chars=None):
+        if self.cache is None:
+            return None
+        return self.cache.key_for(image, f"{self.cache_namespace()}:{data_type or 'text'}:{max_chars}")
+
+    def is_cached(self, image, data_type=None, max_chars=None):
+        """Kırpıntının sonucu önbellekte var mı"""
+        cache_key = self._cache_key(image, data_type, max_chars)
+        return bool(cache_key) and self.cache.contains(cache_key)
+
+    @staticmethod
+    def field_profile(field_settings, field_name):
+        """Alan ayarlarından (veri tipi, en fazla karakter) çiftini al"""
+        settings = (field_settings or {}).get(field_name) or {}
+        return settings.get("data_type") or "text", settings.get("max_length")
+
+    def _extract_text_uncached(self, image, trocr_results=None, tesseract_result=None,
+                               data_type=None, max_chars=None):
+        """TrOCR ve Tesseract sonuçlarından en iyisini seç"""
         results = []
 
         # 1. TrOCR ile dene
-        if self.model and self.processor:
+        if trocr_results is not None:
+            results.extend(text for text in trocr_results if text.strip())
+        elif self.model and self.processor:
             try:
-                # Orijinal resimle
-                result1 = self._trocr_extract(image)
-                if result1.strip():
-                    results.append(result1)
-
-                # Ön işlemli resimle
-                processed = self.preprocess_image(image)
-                result2 = self._trocr_extract(processed)
-                if result2.strip():
-                    results.append(result2)
-
+                results.extend(self.trocr_texts(image, data_type, max_chars))
             except Exception as e:
                 print(f"TrOCR hatası: {e}")
 
         # 2. Tesseract ile dene
-        if self.tesseract_available:
+        if tesseract_result is not None:
+            if tesseract_result.strip():
+                results.append(tesseract_result)
+        elif self.tesseract_available:
             try:
-                result3 = self._tesseract_extract(image)
+                result3 = self._tesseract_extract(image, data_type, max_chars)
                 if result3.strip():
                     results.append(result3)
             except Exception as e:
@@ -117,59 +417,290 @@ class OCRProcessor:
 
         return self._choose_best_result(results)
 
-    def _trocr_extract(self, image):
-        """TrOCR ile metin çıkar"""
+    def _prepare_trocr_image(self, image):
+        """TrOCR girişi için resmi hazırla"""
         # RGB'ye çevir
         if image.mode != 'RGB':
             image = image.convert('RGB')
 
-        # Boyut kontrolü
+        # Boyut kontrolü - çağıranın resmi yerinde değiştirilmez
         if image.size[0] * image.size[1] > 1000000:
-            image.thumbnail((1000, 1000), Image.Resampling.LANCZOS)
+            image = ImageOps.contain(image, (1000, 1000), Image.Resampling.LANCZOS)
+
+        return image
+
+    def _trocr_extract(self, image, data_type=None, max_chars=None):
+        """TrOCR ile metin çıkar"""
+        return self._trocr_extract_batch([image], data_type, max_chars)[0]
+
+    def _trocr_extract_batch(self, images, data_type=None, max_chars=None):
+        """Birden fazla resmi tek generate çağrısıyla TrOCR'dan geçir"""
+        return [text for text, _ in self._trocr_generate(images, data_type, max_chars)]
+
+    def _decoding_kwargs(self, data_type=None, max_chars=None):
+        """Veri tipine göre generate parametrelerini oluştur"""
+        profile = self.DECODING_PROFILES.get(data_type or "text", self.DECODING_PROFILES["text"])
+
+        max_length = profile["max_length"]
+        if max_chars:
+            # En kötü durumda karakter başına bir token, artı başlangıç ve bitiş token'ları
+            max_length = min(max_length, max_chars + 2)
+
+        kwargs = {"max_length": max_length, "num_beams": profile["num_beams"]}
+        if profile["num_beams"] > 1:
+            kwargs["early_stopping"] = True
 
-        # TrOCR işlemi
-        pixel_values = self.processor(image, return_tensors="pt").pixel_values.to(self.device)
+        if profile["allowed_chars"]:
+            allowed_ids = self._allowed_token_ids(profile["allowed_chars"])
+            kwargs["prefix_allowed_tokens_fn"] = lambda batch_id, input_ids: allowed_ids
 
-        with torch.no_grad():
-            generated_ids = self.model.generate(
-                pixel_values,
-                max_length=100,
-                num_beams=4,
-                early_stopping=True
+        return kwargs
+
+    def _allowed_token_ids(self, allowed_chars):
+        """Yalnızca izin verilen karakterlerden oluşan token'ların id listesi"""
+        if allowed_chars not in self._allowed_tokens:
+            tokenizer = self.processor.tokenizer
+            allowed_set = set(allowed_chars)
+
+            token_ids = {tokenizer.eos_token_id, tokenizer.pad_token_id}
+            for token, token_id in tokenizer.get_vocab().items():
+                text = tokenizer.convert_tokens_to_string([token])
+                if text and set(text) <= allowed_set:
+                    token_ids.add(token_id)
+
+            self._allowed_tokens[allowed_chars] = sorted(token_ids)
+
+        return self._allowed_tokens[allowed_chars]
+
+    def _trocr_generate(self, images, data_type=None, max_chars=None):
+        """Resimleri toplu TrOCR'dan geçir, (metin, güven) listesi döndür"""
+        if not images:
+            return []
+
+        prepared = [self._prepare_trocr_image(image) for image in images]
+        decoding_kwargs = self._decoding_kwargs(data_type, max_chars)
+        outputs_all = []
+
+        for start in range(0, len(prepared), self.trocr_batch_size):
+            chunk = prepared[start:start + self.trocr_batch_size]
+            pixel_values = self._pixel_values(chunk)
+            outputs_all.extend(self._decode(data_type, decoding_kwargs, pixel_values=pixel_values))
+
+        return outputs_all
+
+    def _trocr_generate_pairs(self, pairs, data_type=None, max_chars=None):
+        """(ham, ön işlemli) resim çiftlerini TrOCR'dan geçir
+
+        early_accept_score ayarlıysa iki halin encoder'ı tek batch'te bir
+        kez çalışır; önce ham haller çözülür, ön işlemli hal yalnızca ham
+        sonucu eşiğin altında kalan çiftler için çözülür.
+        Dönüş: her çift için [(metin, güven), ...] (bir veya iki eleman)
+        """
+        if not pairs:
+            return []
+
+        if self.scheduler is not None:
+            return self._trocr_generate_pairs_scheduled(pairs, data_type, max_chars)
+
+        if self.early_accept_score is None:
+            outputs = self._trocr_generate([image for pair in pairs for image in pair], data_type, max_chars)
+            return [outputs[2 * i:2 * i + 2] for i in range(len(pairs))]
+
+        decoding_kwargs = self._decoding_kwargs(data_type, max_chars)
+        encoder = self._shared_encoder()
+        results = []
+
+        # Her çift batch'te iki satır kaplar
+        pairs_per_chunk = max(1, self.trocr_batch_size // 2)
+        for start in range(0, len(pairs), pairs_per_chunk):
+            chunk = pairs[start:start + pairs_per_chunk]
+            count = len(chunk)
+            pixel_values = self._pixel_values(
+                [self._prepare_trocr_image(raw) for raw, _ in chunk] +
+                [self._prepare_trocr_image(processed) for _, processed in chunk]
             )
 
-        text = self.processor.batch_decode(generated_ids, skip_special_tokens=True)[0]
-        return self._clean_text(text)
+            if encoder is not None:
+                from transformers.modeling_outputs import BaseModelOutput
 
-    def _tesseract_extract(self, image):
-        """Tesseract ile metin çıkar"""
-        import pytesseract
+                with torch.no_grad():
+                    hidden = encoder(pixel_values=pixel_values).last_hidden_state
+
+                def inputs_for(rows):
+                    return {"encoder_outputs": BaseModelOutput(last_hidden_state=hidden[rows])}
+            else:
+                # Encoder çıktısı dışarıdan verilemeyen modellerde (ONNX) yalnızca
+                # ikinci çözümleme atlanır
+                def inputs_for(rows):
+                    return {"pixel_values": pixel_values[rows]}
+
+            raw_outputs = self._decode(data_type, decoding_kwargs, **inputs_for(slice(0, count)))
+            chunk_results = [[output] for output in raw_outputs]
+
+            pending = [i for i, (text, confidence) in enumerate(raw_outputs)
+                       if not text.strip() or confidence < self.early_accept_score]
+            if pending:
+                rows = torch.tensor([count + i for i in pending], device=pixel_values.device)
+                processed_outputs = self._decode(data_type, decoding_kwargs, **inputs_for(rows))
+                for i, output in zip(pending, processed_outputs):
+                    chunk_results[i].append(output)
+
+            results.extend(chunk_results)
+
+        return results
+
+    def _trocr_generate_pairs_scheduled(self, pairs, data_type=None, max_chars=None):
+        """_trocr_generate_pairs'in zamanlayıcı üzerinden çalışan hali
+
+        Encoder paylaşımı yapılmaz; erken kabul eşiği aynı şekilde uygulanır.
+        """
+        generate = self.scheduler.generate
+        if self.early_accept_score is None:
+            outputs = generate([image for pair in pairs for image in pair], data_type, max_chars)
+            return [outputs[2 * i:2 * i + 2] for i in range(len(pairs))]
 
-        # En iyi konfigürasyonu seç
-        configs = [
-            r'--oem 3 --psm 8 -l tur',  # Tek kelime
-            r'--oem 3 --psm 7 -l tur',  # Tek satır
-            r'--oem 3 --psm 6 -l tur',  # Düzgün blok
+        results = [[output] for output in generate([raw for raw, _ in pairs], data_type, max_chars)]
+        pending = [i for i, [(text, confidence)] in enumerate(results)
+                   if not text.strip() or confidence < self.early_accept_score]
+        if pending:
+            outputs = generate([pairs[i][1] for i in pending], data_type, max_chars)
+            for i, output in zip(pending, outputs):
+                results[i].append(output)
+        return results
+
+    def _shared_encoder(self):
+        """Çıktısı generate'e verilebilen encoder'ı döndür (PyTorch dışı modellerde None)"""
+        if not isinstance(self.model, torch.nn.Module):
+            return None
+        get_encoder = getattr(self.model, "get_encoder", None)
+        return get_encoder() if get_encoder else None
+
+    def _pixel_values(self, images):
+        """Hazırlanmış resimleri tek giriş tensörüne dönüştür"""
+        # İşlemci her resmi sabit giriş boyutuna getirir, bu yüzden
+        # kırpıntılar ek dolgu gerekmeden tek tensörde birleşir
+        return self.processor(images=images, return_tensors="pt").pixel_values.to(self.device)
+
+    def _decode(self, data_type, decoding_kwargs, **inputs):
+        """generate çalıştır, (metin, güven) listesi döndür"""
+        with timer("trocr_generate"), torch.no_grad():
+            outputs = self.model.generate(
+                output_scores=True,
+                return_dict_in_generate=True,
+                **inputs,
+                **decoding_kwargs
+            )
+
+        # Farklı uzunluktaki çıktılar pad token ile doldurulur, decode sırasında atılır
+        decoded = self.processor.batch_decode(outputs.sequences, skip_special_tokens=True)
+        confidences = self._sequence_confidences(outputs)
+        return [
+            (self._clean_text(text, data_type), confidence)
+            for text, confidence in zip(decoded, confidences)
         ]
 
-        best_text = ""
-        best_conf = 0
+    def _sequence_confidences(self, outputs):
+        """generate çıktısından dizi başına 0-1 arası güven skoru hesapla"""
+        # Beam search: uzunluğa göre normalize edilmiş dizi log olasılığı
+        if getattr(outputs, "sequences_scores", None) is not None:
+            return torch.exp(outputs.sequences_scores).tolist()
+
+        # Greedy: üretilen token'ların ortalama log olasılığı (pad hariç)
+        transition = self.model.compute_transition_scores(
+            outputs.sequences, outputs.scores, normalize_logits=True
+        )
+        generated = outputs.sequences[:, -transition.shape[1]:]
+        mask = generated != self.model.config.pad_token_id
+        mean_logprob = (transition * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)
+        return torch.exp(mean_logprob).tolist()
+
+    def trocr_texts(self, image, data_type=None, max_chars=None):
+        """Orijinal ve ön işlemli resmin boş olmayan TrOCR çıktıları
+
+        Ham sonuç yeterince güvenliyse yalnızca orijinal resim çözülür.
+        """
+        if not (self.model and self.processor):
+            return []
+
+        with timer("engine", engine="trocr"):
+            processed = self.preprocess_image(image)
+            variants = self._trocr_generate_pairs([(image, processed)], data_type, max_chars)[0]
+        return [text for text, _ in variants if text.strip()]
+
+    def trocr_extract_with_confidence(self, image, data_type=None, max_chars=None):
+        """Ham ve ön işlemli kırpıntıyı tek batch'te çalıştır, en güvenli sonucu döndür"""
+        if not (self.model and self.processor):
+            return "", 0.0
+
+        with timer("engine", engine="trocr"):
+            outputs = self._trocr_generate_pairs([(image, self.preprocess_image(image))], data_type, max_chars)[0]
+        candidates = [(text, confidence) for text, confidence in outputs if text.strip()]
+        if not candidates:
+            return "", 0.0
+        return max(candidates, key=lambda item: item[1])
 
-        for config in configs:
+    def extract_trocr_batch(self, crops, field_settings=None, processed_crops=None):
+        """Alan kırpıntılarının ham ve ön işlemli hallerini toplu TrOCR'dan geçir
+
+        Aynı çözümleme profiline sahip alanlar birlikte işlenir.
+        Dönüş: {alan_adı: [ham_sonuç, ön_işlemli_sonuç]} (ham sonuç
+        early_accept_score'u geçtiyse yalnızca [ham_sonuç]). processed_crops
+        (preprocess_fields çıktısı) verilirse alanlar tekrar ön işlenmez.
+        """
+        if not crops or not (self.model and self.processor):
+            return {}
+
+        with timer("engine", engine="trocr_batch"):
+            return self._extract_trocr_batch(crops, field_settings, processed_crops)
+
+    def _extract_trocr_batch(self, crops, field_settings=None, processed_crops=None):
+        # Çözümleme profiline göre grupla
+        groups = {}
+        for field_name, cropped in crops.items():
+            try:
+                processed = (processed_crops or {}).get(field_name)
+                if processed is None:
+                    processed = self.preprocess_image(cropped)
+            except Exception as e:
+                print(f"{field_name} ön işleme hatası: {e}")
+                continue
+            profile = self.field_profile(field_settings, field_name)
+            groups.setdefault(profile, []).append((field_name, cropped, processed))
+
+        results = {}
+        for (data_type, max_chars), entries in groups.items():
+            pairs = [(cropped, processed) for _, cropped, processed in entries]
             try:
-                text = pytesseract.image_to_string(image, config=config)
-                # Basit güven hesabı
-                conf = len([c for c in text if c.isalnum()]) / max(len(text), 1)
-
-                if conf > best_conf and text.strip():
-                    best_text = text
-                    best_conf = conf
-            except:
+                outputs = self._trocr_generate_pairs(pairs, data_type, max_chars)
+            except Exception as e:
+                print(f"TrOCR toplu işlem hatası ({data_type}): {e}")
                 continue
 
-        return self._clean_text(best_text)
+            # Çıktıları alan bazında geri böl
+            for (field_name, _, _), variants in zip(entries, outputs):
+                results[field_name] = [text for text, _ in variants]
+
+        return results
+
+    def _tesseract_extract(self, image, data_type=None, max_chars=None):
+        """Tesseract ile metin çıkar"""
+        text, _ = self.tesseract_extract_with_confidence(image, data_type, max_chars)
+        return text
 
-    def _clean_text(self, text):
+    def tesseract_extract_with_confidence(self, image, data_type=None, max_chars=None):
+        """Tesseract'ı tek geçişte çalıştır, metni ve ortalama kelime güvenini döndür"""
+        if not self.tesseract_available:
+            return "", 0.0
+
+        with timer("engine", engine="tesseract"):
+            text, confidence = self.tesseract.extract(image, data_type, max_chars)
+        return self._clean_text(text, data_type), confidence
+
+    def extract_with_tesseract(self, image, data_type=None, max_chars=None):
+        """Yalnızca Tesseract ile metin çıkar"""
+        return self._tesseract_extract(image, data_type, max_chars)
+
+    def _clean_text(self, text, data_type=None):
         """Metni temizle"""
         if not text:
             return ""
@@ -177,8 +708,11 @@ class OCRProcessor:
         # Temel temizlik
         text = text.strip()
 
-        # Gereksiz karakterleri kaldır
-        text = re.sub(r'[^\w\säöüçğışÄÖÜÇĞIŞ\d\.\,\-\+\(\)\/\:]', ' ', text)
+        # Gereksiz karakterleri kaldır (e-posta alanlarında @ korunur)
+        if data_type == "email":
+            text = re.sub(r'[^\w\säöüçğışÄÖÜÇĞIŞ\d\.\,\-\+\(\)\/\:@]', ' ', text)
+        else:
+            text = re.sub(r'[^\w\säöüçğışÄÖÜÇĞIŞ\d\.\,\-\+\(\)\/\:]', ' ', text)
 
         # Çoklu boşlukları tek boşluk yap
         text = re.sub(r'\s+', ' ', text)
@@ -200,6 +734,10 @@ class OCRProcessor:
         if len(results) == 1:
             return results[0]
 
+        with timer("scoring"):
+            return self._score_results(results)
+
+    def _score_results(self, results):
         # Basit skorlama
         scores = []
         for text in results:
@@ -251,19 +789,237 @@ class OCRProcessor:
             print(f"PDF dönüştürme hatası: {e}")
             return None
 
-    def batch_extract(self, image, coordinates_dict):
-        """Birden fazla alan için toplu OCR"""
+    def iter_pdf_pages(self, pdf_path, dpi=None, region=None, text_layer_fields=None):
+        """PDF sayfalarını tek açık belgeden sırayla resme çevir
+
+        Sayfalar istendikçe çizilir, aynı anda bellekte yalnızca bir sayfa
+        bulunur. region (şablon koordinatlarında x1, y1, x2, y2) verilirse
+        sayfanın yalnızca bu bölgesi çizilir. Her sayfa için resim ile
+        birlikte şablon koordinatlarını resme taşıyan offset ve ölçek döner.
+
+        text_layer_fields (alan koordinatları) verilirse bu alanlar önce PDF
+        metin katmanından okunur. region verilmişse çizim bölgesi metni
+        bulunamayan alanlara daraltılır; tüm alanlar metin katmanından
+        okunduysa sayfa hiç çizilmez (image None olur).
+        """
+        dpi = dpi or self.TEMPLATE_DPI
+
+        try:
+            pdf = pdfplumber.open(pdf_path)
+        except Exception as e:
+            print(f"pdfplumber açamadı, pdf2image deneniyor: {e}")
+            yield from self._iter_pdf_pages_pdf2image(pdf_path, dpi, region)
+            return
+
+        with pdf:
+            for index, page_obj in enumerate(pdf.pages):
+                yield self._render_pdfplumber_page_with_text(page_obj, index, dpi, region, text_layer_fields)
+                # Sayfanın ayrıştırılmış nesnelerini bırak
+                page_obj.close()
+
+    def iter_pdf_page_objects(self, pdf_path):
+        """PDF'yi bir kez açıp sayfaları (sayfa no, pdfplumber sayfası) olarak üret
+
+        Çizim ve metin katmanı okuması aynı açık sayfadan yapılır. Belge
+        pdfplumber ile açılamazsa None döner; çağıran iter_pdf_pages'e
+        (pdf2image) geçebilir.
+        """
+        try:
+            pdf = pdfplumber.open(pdf_path)
+        except Exception as e:
+            print(f"pdfplumber açamadı, pdf2image deneniyor: {e}")
+            return None
+        return self._iter_page_objects(pdf)
+
+    def _iter_page_objects(self, pdf):
+        with pdf:
+            for index, page_obj in enumerate(pdf.pages):
+                yield index, page_obj
+                page_obj.close()
+
+    def render_pdf_page(self, page_obj, index=0, dpi=None):
+        """Açık pdfplumber sayfasının tamamını çiz"""
+        return self._render_pdfplumber_page(page_obj, index, dpi or self.TEMPLATE_DPI, None)
+
+    def _render_pdfplumber_page_with_text(self, page_obj, index, dpi, region, text_layer_fields):
+        """Önce metin katmanını oku, yalnızca metni bulunamayan alanlar için çiz"""
+        if not text_layer_fields:
+            return self._render_pdfplumber_page(page_obj, index, dpi, region)
+
+        text_fields = self.extract_text_layer(page_obj, text_layer_fields)
+        remaining = {name: coords for name, coords in text_layer_fields.items()
+                     if coords and name not in text_fields}
+
+        if not remaining:
+            # Tüm alanlar metin katmanında bulundu, rasterleştirmeye gerek yok
+            return RenderedPage(index, None, (0, 0), dpi / self.TEMPLATE_DPI, text_fields)
+
+        if region:
+            region = coordinates_region(remaining)
+
+        rendered = self._render_pdfplumber_page(page_obj, index, dpi, region)
+        return rendered._replace(text_fields=text_fields)
+
+    def extract_text_layer(self, page_obj, coordinates_dict, image_width=None):
+        """Dijital PDF'nin metin katmanından alanları oku (metni olmayanlar dönmez)
+
+        image_width, koordinatların çizildiği resmin genişliğidir; verilmezse
+        koordinatlar şablon çözünürlüğünde kabul edilir.
+        """
+        with timer("pdf_text_layer"):
+            return self._extract_text_layer(page_obj, coordinates_dict, image_width)
+
+    def _extract_text_layer(self, page_obj, coordinates_dict, image_width=None):
+        if image_width:
+            points_per_pixel = page_obj.width / image_width
+        else:
+            points_per_pixel = 72 / self.TEMPLATE_DPI
+
+        # Taranmış sayfalarda metin katmanı yoktur
+        if not page_obj.chars:
+            return {}
+
+        text_fields = {}
+        for field_name, coords in coordinates_dict.items():
+            if not coords:
+                continue
+
+            x1, y1, x2, y2 = coords
+            bbox = (
+                max(0, x1 * points_per_pixel),
+                max(0, y1 * points_per_pixel),
+                min(page_obj.width, x2 * points_per_pixel),
+                min(page_obj.height, y2 * points_per_pixel)
+            )
+            if bbox[2] <= bbox[0] or bbox[3] <= bbox[1]:
+                continue
+
+            try:
+                text = page_obj.within_bbox(bbox).extract_text() or ""
+            except Exception as e:
+                print(f"{field_name} metin katmanı okunamadı: {e}")
+                continue
+
+            # Satır sonlarını ve çoklu boşlukları OCR çıktısı gibi tek boşluğa indir
+            text = ' '.join(text.split())
+            if text:
+                text_fields[field_name] = text
+
+        return text_fields
+
+    def extract_pdf_text_layer(self, pdf_path, coordinates_dict, page=0, image_width=None):
+        """PDF dosyasının bir sayfasındaki alanları metin katmanından oku"""
+        try:
+            with pdfplumber.open(pdf_path) as pdf:
+                if page < len(pdf.pages):
+                    return self.extract_text_layer(pdf.pages[page], coordinates_dict, image_width)
+        except Exception as e:
+            print(f"PDF metin katmanı okunamadı: {e}")
+        return {}
+
+    def _render_pdfplumber_page(self, page_obj, index, dpi, region):
+        """pdfplumber sayfasını (veya bir bölgesini) çiz"""
+        scale = dpi / self.TEMPLATE_DPI
+        # Şablon çözünürlüğü 72 dpi olduğundan şablon pikseli = PDF noktası
+        points_per_pixel = 72 / self.TEMPLATE_DPI
+
+        if region:
+            x1, y1, x2, y2 = region
+            bbox = (
+                max(0, x1 * points_per_pixel),
+                max(0, y1 * points_per_pixel),
+                min(page_obj.width, x2 * points_per_pixel),
+                min(page_obj.height, y2 * points_per_pixel)
+            )
+            page_obj = page_obj.crop(bbox)
+            offset = (bbox[0] / points_per_pixel, bbox[1] / points_per_pixel)
+        else:
+            offset = (0, 0)
+
+        with timer("pdf_render"):
+            image = page_obj.to_image(resolution=dpi).original
+        return RenderedPage(index, image, offset, scale)
+
+    def _iter_pdf_pages_pdf2image(self, pdf_path, dpi, region):
+        """pdf2image ile sayfaları tek tek çiz (yalnızca istenen sayfa rasterleştirilir)"""
+        try:
+            from pdf2image import convert_from_path, pdfinfo_from_path
+        except ImportError:
+            print("pdf2image bulunamadı. pip install pdf2image")
+            return
+
+        scale = dpi / self.TEMPLATE_DPI
+        page_count = pdfinfo_from_path(pdf_path)["Pages"]
+
+        for index in range(page_count):
+            with timer("pdf_render"):
+                images = convert_from_path(pdf_path, first_page=index + 1, last_page=index + 1, dpi=dpi)
+            if not images:
+                continue
+
+            image = images[0]
+            offset = (0, 0)
+            if region:
+                x1, y1, x2, y2 = region
+                image = image.crop((int(x1 * scale), int(y1 * scale), int(x2 * scale), int(y2 * scale)))
+                offset = (x1, y1)
+
+            yield RenderedPage(index, image, offset, scale)
+
+    def crop_fields(self, image, coordinates_dict):
+        """Koordinatları verilen alanları kırp"""
+        crops = {}
+
+        with timer("crop"):
+            for field_name, coords in coordinates_dict.items():
+                if coords:
+                    try:
+                        x1, y1, x2, y2 = coords
+                        crops[field_name] = image.crop((x1, y1, x2, y2))
+                    except Exception as e:
+                        print(f"{field_name} alanı kırpılırken hata: {e}")
+
+        return crops
+
+    def batch_extract(self, image, coordinates_dict, progress_callback=None, field_settings=None):
+        """Birden fazla alan için toplu OCR
+
+        field_settings ({alan: {"data_type", "max_length"}}) her alanın
+        çözümleme profilini belirler.
+        """
+        crops = self.crop_fields(image, coordinates_dict)
+        # Boş bırakılmış alanlar hiçbir motora gönderilmez
+        blank = self.blank_fields(image, coordinates_dict, field_settings)
+
+        # TrOCR profil başına tek seferde (önbellekte olanlar hariç)
+        pending = {name: crop for name, crop in crops.items()
+                   if name not in blank and not self.is_cached(crop, *self.field_profile(field_settings, name))}
+        processed_crops = self.preprocess_fields(image, {name: coordinates_dict[name] for name in pending})
+        trocr_results = self.extract_trocr_batch(pending, field_settings, processed_crops)
+
         results = {}
+        total_fields = len([coords for coords in coordinates_dict.values() if coords])
 
         for field_name, coords in coordinates_dict.items():
-            if coords:
+            if not coords:
+                continue
+
+            if field_name in crops and field_name not in blank:
+                data_type, max_chars = self.field_profile(field_settings, field_name)
                 try:
-                    x1, y1, x2, y2 = coords
-                    cropped = image.crop((x1, y1, x2, y2))
-                    text = self.extract_text(cropped)
-                    results[field_name] = text
+                    results[field_name] = self.extract_text(
+                        crops[field_name],
+                        trocr_results=trocr_results.get(field_name),
+                        data_type=data_type,
+                        max_chars=max_chars
+                    )
                 except Exception as e:
                     print(f"{field_name} alanı işlenirken hata: {e}")
                     results[field_name] = ""
+            else:
+                results[field_name] = ""
+
+            if progress_callback:
+                progress_callback(len(results), total_fields, field_name)
 
-        return results
\ No newline at end of file
+        return results
@@ -0,0 +1,326 @@
+# ocr_service.py
+import argparse
+import json
+import os
+import queue
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from config_manager import ConfigManager
+from form_pipeline import SUPPORTED_EXTENSIONS, create_pipeline, pipeline_settings
+from ocr_metrics import METRICS
+from trocr_scheduler import TrOCRBatchScheduler
+
+# Dosya adı verilmezse uzantı Content-Type'tan çıkarılır
+CONTENT_TYPE_EXTENSIONS = {
+    "application/pdf": ".pdf",
+    "image/png": ".png",
+    "image/jpeg": ".jpg"
+}
+
+
+class OCRJob:
+    """Kuyruğa alınmış tek bir form dosyası"""
+
+    def __init__(self, job_id, file_path, filename):
+        self.job_id = job_id
+        self.file_path = file_path
+        self.filename = filename
+        self.status = "queued"
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.records = None
+        self.error = None
+        self.done = threading.Event()
+
+    def to_dict(self):
+        elapsed = None
+        if self.started:
+            elapsed = round((self.finished or time.time()) - self.started, 3)
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "file": self.filename,
+            "created": self.created,
+            "elapsed": elapsed,
+            "pages": len(self.records) if self.records is not None else None,
+            "error": self.error
+        }
+
+    def result(self):
+        """save_results ile aynı biçimde sonuç (çok sayfalı PDF'de sayfa başına bir sözlük)"""
+        forms = [
+            {field_name: text.strip() for field_name, text in record["results"].items()}
+            for record in self.records or []
+        ]
+        return forms[0] if len(forms) == 1 else forms
+
+
+class JobQueue:
+    """Sınırlı iş kuyruğu ve iş tablosu
+
+    Kuyruk doluysa yeni iş reddedilir (geri basınç). İşçi thread'leri
+    aynı FormPipeline'ı, dolayısıyla süreçte bir kez yüklenen modelleri
+    paylaşır.
+    """
+
+    def __init__(self, pipeline, max_pending=32, workers=1, keep_finished=1000):
+        self.pipeline = pipeline
+        self.keep_finished = keep_finished
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._workers = []
+
+        for index in range(workers):
+            thread = threading.Thread(target=self._run, name=f"ocr-job-worker-{index}", daemon=True)
+            thread.start()
+            self._workers.append(thread)
+
+    def submit(self, data, filename):
+        """Dosyayı geçici diske yazıp kuyruğa al; kuyruk doluysa queue.Full fırlatır"""
+        suffix = os.path.splitext(filename)[1].lower()
+        fd, file_path = tempfile.mkstemp(prefix="ocr_job_", suffix=suffix)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+
+        job = OCRJob(uuid.uuid4().hex, file_path, filename)
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            os.remove(file_path)
+            raise
+
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._forget_finished()
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self):
+        with self._lock:
+            statuses = [job.status for job in self._jobs.values()]
+        return {
+            "pending": self._queue.qsize(),
+            "capacity": self._queue.maxsize,
+            "workers": len(self._workers),
+            "running": statuses.count("running"),
+            "done": statuses.count("done"),
+            "failed": statuses.count("failed")
+        }
+
+    def _forget_finished(self):
+        """Tablo sınırı aşılınca en eski biten işleri unut"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.done.is_set()]
+        for job_id in finished[:max(0, len(self._jobs) - self.keep_finished)]:
+            del self._jobs[job_id]
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            job.status = "running"
+            job.started = time.time()
+            try:
+                job.records = self.pipeline.process_file(job.file_path)
+                errors = [record["error"] for record in job.records if record["error"]]
+                if errors and len(errors) == len(job.records):
+                    job.status = "failed"
+                    job.error = errors[0]
+                else:
+                    job.status = "done"
+            except Exception as e:
+                job.status = "failed"
+                job.error = str(e)
+            finally:
+                job.finished = time.time()
+                try:
+                    os.remove(job.file_path)
+                except OSError:
+                    pass
+                job.done.set()
+                self._queue.task_done()
+
+
+class OCRRequestHandler(BaseHTTPRequestHandler):
+    """POST /jobs, GET /jobs/<id>, GET /jobs/<id>/result, GET /health, GET /metrics"""
+
+    server_version = "OCRService/1.0"
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path.rstrip('/') != "/jobs":
+            return self._send_json(404, {"error": "Bulunamadı"})
+
+        query = parse_qs(url.query)
+        try:
+            wait = float(query.get("wait", ["0"])[0] or 0)
+        except ValueError:
+            wait = None
+        # NaN de reddedilir (hiçbir karşılaştırma doğru değildir)
+        if wait is None or not wait >= 0:
+            return self._send_json(400, {"error": "wait saniye cinsinden negatif olmayan bir sayı olmalı"})
+
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = None
+        if length is None or length < 0:
+            return self._send_json(400, {"error": "Content-Length negatif olmayan bir tam sayı olmalı"})
+        if length == 0:
+            return self._send_json(400, {"error": "Boş istek gövdesi"})
+        if length > self.server.max_upload_bytes:
+            return self._send_json(413, {"error": "Dosya çok büyük"})
+
+        filename = query.get("filename", [""])[0]
+        if not filename:
+            content_type = (self.headers.get("Content-Type") or "").split(';')[0].strip()
+            filename = "form" + CONTENT_TYPE_EXTENSIONS.get(content_type, "")
+        if not filename.lower().endswith(SUPPORTED_EXTENSIONS):
+            return self._send_json(415, {"error": f"Desteklenen türler: {', '.join(SUPPORTED_EXTENSIONS)}"})
+
+        data = self.rfile.read(length)
+        try:
+            job = self.server.jobs.submit(data, filename)
+        except queue.Full:
+            # İstemci biraz bekleyip tekrar denemeli
+            return self._send_json(503, {"error": "Kuyruk dolu"}, headers={"Retry-After": "1"})
+
+        if wait > 0 and job.done.wait(min(wait, self.server.max_wait_seconds)):
+            return self._send_job_result(job)
+
+        return self._send_json(202, job.to_dict(), headers={"Location": f"/jobs/{job.job_id}"})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        parts = [part for part in url.path.split('/') if part]
+
+        if parts == ["metrics"]:
+            if parse_qs(url.query).get("format", [""])[0] == "json":
+                return self._send_json(200, {"summary": METRICS.summary(), "raw": METRICS.snapshot()})
+            return self._send_text(200, METRICS.to_prometheus(), "text/plain; version=0.0.4; charset=utf-8")
+
+        if parts == ["health"]:
+            processor = self.server.jobs.pipeline.processor
+            return self._send_json(200, {
+                "status": "ok",
+                "queue": self.server.jobs.stats(),
+                "batching": processor.scheduler.stats() if processor.scheduler else None,
+                "models": processor.registry.report()
+            })
+
+        if len(parts) in (2, 3) and parts[0] == "jobs":
+            job = self.server.jobs.get(parts[1])
+            if job is None:
+                return self._send_json(404, {"error": "İş bulunamadı"})
+            if len(parts) == 2:
+                return self._send_json(200, job.to_dict())
+            if parts[2] == "result":
+                if not job.done.is_set():
+                    return self._send_json(409, job.to_dict())
+                return self._send_job_result(job)
+
+        return self._send_json(404, {"error": "Bulunamadı"})
+
+    def _send_job_result(self, job):
+        if job.status == "failed":
+            return self._send_json(500, job.to_dict())
+        return self._send_json(200, job.result())
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload, ensure_ascii=False, indent=2)
+        return self._send_text(status, body, "application/json; charset=utf-8", headers)
+
+    def _send_text(self, status, text, content_type, headers=None):
+        body = text.encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        print(f"{self.address_string()} - {format % args}")
+
+
+class OCRServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, jobs, max_upload_mb=20, max_wait_seconds=60):
+        super().__init__(address, OCRRequestHandler)
+        self.jobs = jobs
+        self.max_upload_bytes = int(max_upload_mb * 1024 * 1024)
+        self.max_wait_seconds = max_wait_seconds
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m ocr_service",
+        description="Formları HTTP üzerinden kabul eden, kuyruklu OCR servisi"
+    )
+    parser.add_argument("--template", default="form_config.json",
+                        help="Alan koordinatlarını içeren konfigürasyon dosyası")
+    parser.add_argument("--host", default="127.0.0.1", help="Dinlenecek adres")
+    parser.add_argument("--port", type=int, default=8765, help="Dinlenecek port")
+    parser.add_argument("--workers", type=int, default=4,
+                        help="Kuyruktan iş alan OCR thread sayısı (modeller paylaşılır)")
+    parser.add_argument("--max-pending", type=int, default=32,
+                        help="Kuyrukta bekleyebilecek en fazla iş; aşılınca 503 döner")
+    parser.add_argument("--max-upload-mb", type=float, default=20, help="En büyük form dosyası")
+    parser.add_argument("--ensemble", action="store_true", help="TrOCR yerine EnsembleOCR kullan")
+    parser.add_argument("--templates", default=None,
+                        help="Her sayfa için en yakın şablonun seçileceği şablon kütüphanesi klasörü")
+    parser.add_argument("--batch-wait-ms", type=float, default=5,
+                        help="Farklı işlerin kırpıntılarını ortak batch'te toplamak için en fazla bekleme "
+                             "(0: toplama kapalı)")
+    parser.add_argument("--max-batch", type=int, default=32,
+                        help="Ortak generate batch'indeki en fazla kırpıntı")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    settings = pipeline_settings(ConfigManager(args.template))
+    if args.templates:
+        settings["library_settings"].update({"enabled": True, "directory": args.templates})
+    if not settings["coordinates"] and not settings["library_settings"]["enabled"]:
+        print(f"{args.template} içinde koordinat tanımlı alan yok")
+        return 1
+
+    # Her iş parçacığının üç motoru (Tesseract, EasyOCR, TrOCR) ortak havuzda
+    # sıra beklemeden aynı anda çalışabilsin
+    settings["ensemble_options"]["engine_workers"] = max(6, args.workers * 3)
+
+    # Modeller ilk istekten önce yüklenir ve servis boyunca sıcak kalır
+    pipeline = create_pipeline(settings, args.ensemble)
+    if args.batch_wait_ms > 0:
+        pipeline.processor.scheduler = TrOCRBatchScheduler(
+            pipeline.processor, max_batch=args.max_batch, max_wait_ms=args.batch_wait_ms
+        )
+    jobs = JobQueue(pipeline, max_pending=args.max_pending, workers=args.workers)
+
+    server = OCRServer((args.host, args.port), jobs, max_upload_mb=args.max_upload_mb)
+    print(f"OCR servisi http://{args.host}:{args.port} adresinde dinleniyor")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Servis durduruluyor...")
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,241 @@
+# result_sinks.py
+import csv
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+
+DEFAULT_OUTPUT_SETTINGS = {
+    "format": "json",
+    "encoding": "utf-8",
+    "pretty_print": True,
+    "path": None,
+    "batch_size": 500,
+    "indexed_fields": ["IBAN Numarası", "Cep Telefonu Numarası", "İşlem Tarihi", "Tarih"]
+}
+
+# Kayıtların alanlar dışındaki sütunları
+RECORD_COLUMNS = ["file", "page", "template", "error"]
+
+
+class ResultSink(ABC):
+    """Form kayıtlarını sırayla ekleyen çıktı
+
+    Kayıt biçimi FormPipeline.process_file ile aynıdır:
+    {"file", "page", "results": {alan: metin}, "error", ...}
+    """
+
+    path = None
+    # Açılırken çıktıda önceki sonuçlar var mıydı (truncate sonrası False)
+    had_results = False
+
+    @abstractmethod
+    def write(self, record):
+        """Kaydı ekle"""
+
+    def write_many(self, records):
+        for record in records:
+            self.write(record)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class JSONFileSink(ResultSink):
+    """Form başına bir <ad>_ocr_results.json dosyası (arayüzün eski davranışı)
+
+    directory, dosyaların yazılacağı klasördür (boş: çalışma klasörü); yoksa
+    oluşturulur.
+    """
+
+    def __init__(self, directory="", encoding="utf-8", pretty_print=True):
+        if directory.lower().endswith('.json') or os.path.isfile(directory):
+            raise ValueError(f"json biçiminde çıktı yolu bir klasör olmalı: {directory} "
+                             f"(tek dosya için jsonl biçimini kullanın)")
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.had_results = any(name.endswith("_ocr_results.json") for name in os.listdir(directory or "."))
+        self.directory = directory
+        self.encoding = encoding
+        self.indent = 2 if pretty_print else None
+        self.path = directory
+
+    def write(self, record):
+        if record["file"]:
+            base_name = os.path.splitext(os.path.basename(record["file"]))[0]
+            if record.get("page") is not None:
+                base_name = f"{base_name}_sayfa{record['page'] + 1}"
+            output_path = os.path.join(self.directory, f"{base_name}_ocr_results.json")
+        else:
+            output_path = os.path.join(self.directory, "ocr_results.json")
+
+        with open(output_path, 'w', encoding=self.encoding) as f:
+            json.dump(record["results"], f, ensure_ascii=False, indent=self.indent)
+        self.path = output_path
+
+
+class JSONLSink(ResultSink):
+    """Satır başına bir kayıt"""
+
+    def __init__(self, path, encoding="utf-8", truncate=False):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.had_results = not truncate and os.path.exists(path) and os.path.getsize(path) > 0
+        self._file = open(path, 'w' if truncate else 'a', encoding=encoding)
+
+    def write(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class CSVSink(ResultSink):
+    """Form başına bir satır, alan başına bir sütun
+
+    Var olan dosyaya eklenirken dosyadaki başlık kullanılır; başlıkta
+    olmayan alanlar yazılmaz.
+    """
+
+    def __init__(self, path, field_names, encoding="utf-8", truncate=False):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        header = None
+        if not truncate and os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, 'r', encoding=encoding, newline='') as f:
+                reader = csv.reader(f)
+                header = next(reader, None)
+                self.had_results = next(reader, None) is not None
+
+        self.columns = header or RECORD_COLUMNS + [name for name in field_names if name not in RECORD_COLUMNS]
+        self._file = open(path, 'a' if header else 'w', encoding=encoding, newline='')
+        self._writer = csv.DictWriter(self._file, fieldnames=self.columns, extrasaction='ignore')
+        if header is None:
+            self._writer.writeheader()
+
+    def write(self, record):
+        row = {column: record.get(column) for column in RECORD_COLUMNS}
+        row.update(record["results"])
+        self._writer.writerow(row)
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class SQLiteSink(ResultSink):
+    """forms ve form_fields tablolarına toplu işlemlerle yazan çıktı
+
+    Kayıtlar batch_size forma kadar bellekte tutulup tek işlemde eklenir.
+    indexed_fields (IBAN, telefon, tarih gibi arama yapılan alanlar) için
+    değere göre kısmi indeks oluşturulur:
+    SELECT ... FROM form_fields WHERE field = 'IBAN Numarası' AND value = ?
+    """
+
+    def __init__(self, path, batch_size=500, indexed_fields=(), truncate=False):
+        self.path = path
+        self.batch_size = batch_size
+        self._pending = []
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS forms ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, file TEXT, page INTEGER, template TEXT, "
+            "error TEXT, elapsed REAL, created REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS form_fields ("
+            "form_id INTEGER NOT NULL REFERENCES forms(id), field TEXT NOT NULL, value TEXT, "
+            "PRIMARY KEY (form_id, field))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_forms_file ON forms(file, page)")
+        for field_name in indexed_fields:
+            # DDL parametre almaz; alan adı SQL dizgesi olarak kaçışlanır
+            index_name = "idx_form_fields_" + hashlib.sha1(field_name.encode('utf-8')).hexdigest()[:12]
+            literal = field_name.replace("'", "''")
+            self._conn.execute(
+                f"CREATE INDEX IF NOT EXISTS {index_name} ON form_fields(value) WHERE field = '{literal}'"
+            )
+        if truncate:
+            self._conn.execute("DELETE FROM form_fields")
+            self._conn.execute("DELETE FROM forms")
+        self._conn.commit()
+        self.had_results = self._conn.execute("SELECT 1 FROM forms LIMIT 1").fetchone() is not None
+
+    def write(self, record):
+        self._pending.append(record)
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return
+
+        created = time.time()
+        with self._conn:
+            for record in self._pending:
+                cursor = self._conn.execute(
+                    "INSERT INTO forms (file, page, template, error, elapsed, created) VALUES (?, ?, ?, ?, ?, ?)",
+                    (record["file"], record.get("page"), record.get("template"), record.get("error"),
+                     record.get("elapsed"), created)
+                )
+                self._conn.executemany(
+                    "INSERT INTO form_fields (form_id, field, value) VALUES (?, ?, ?)",
+                    [(cursor.lastrowid, field_name, value) for field_name, value in record["results"].items()]
+                )
+        self._pending = []
+
+    def close(self):
+        self.flush()
+        self._conn.close()
+
+
+def default_output_path(output_format):
+    # json biçiminde yol, form dosyalarının yazılacağı klasördür (boş: çalışma klasörü)
+    return {"jsonl": "results.jsonl", "csv": "results.csv", "sqlite": "results.sqlite"}.get(output_format, "")
+
+
+def create_sink(settings=None, field_names=(), path=None, truncate=False):
+    """output_settings sözlüğünden çıktı oluştur
+
+    format: json (form başına dosya), jsonl, csv veya sqlite. path
+    verilmezse ayarlardaki veya biçimin varsayılan yolu kullanılır.
+    Çıktılar varsayılan olarak var olan sonuçlara ekler; truncate=True
+    açıkça verilirse jsonl/csv/sqlite çıktısındaki önceki sonuçlar silinir.
+    """
+    merged = dict(DEFAULT_OUTPUT_SETTINGS)
+    merged.update(settings or {})
+
+    output_format = merged["format"]
+    path = path or merged["path"] or default_output_path(output_format)
+
+    if output_format == "json":
+        return JSONFileSink(path, encoding=merged["encoding"], pretty_print=merged["pretty_print"])
+    if output_format == "jsonl":
+        return JSONLSink(path, encoding=merged["encoding"], truncate=truncate)
+    if output_format == "csv":
+        return CSVSink(path, field_names, encoding=merged["encoding"], truncate=truncate)
+    if output_format == "sqlite":
+        return SQLiteSink(path, batch_size=merged["batch_size"], indexed_fields=merged["indexed_fields"],
+                          truncate=truncate)
+    raise ValueError(f"Bilinmeyen çıktı biçimi: {output_format}")
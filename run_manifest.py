@@ -0,0 +1,176 @@
+# run_manifest.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Okuma bloğu; büyük PDF'ler belleğe tamamen alınmadan özetlenir
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_digest(file_path):
+    """Dosya içeriğinin SHA-256 özeti (dosya adı veya yeri değişse de aynı kalır)"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def template_version(settings):
+    """Sonuçları etkileyen şablon ayarlarının kısa özeti
+
+    Koordinatlar, alan ayarları, hizalama şablonu veya şablon
+    kütüphanesindeki dosyalar değişince sürüm de değişir; önceki
+    çalışmanın tamamlanmış dosyaları bu durumda yeniden işlenir.
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps({
+        "coordinates": settings["coordinates"],
+        "field_settings": settings["field_settings"],
+        "template_image": settings["registration_settings"].get("template_image")
+        if settings["registration_settings"].get("enabled") else None
+    }, sort_keys=True, ensure_ascii=False).encode('utf-8'))
+
+    library_settings = settings.get("library_settings") or {}
+    directory = library_settings.get("directory")
+    if library_settings.get("enabled") and directory and os.path.isdir(directory):
+        for entry in sorted(os.scandir(directory), key=lambda e: e.name):
+            if entry.name.endswith('.json'):
+                digest.update(entry.name.encode('utf-8'))
+                digest.update(file_digest(entry.path).encode('ascii'))
+
+    return digest.hexdigest()[:16]
+
+
+class RunManifest:
+    """Toplu çalışmanın dosya ve alan bazında ilerleme kaydı
+
+    Dosyalar içerik özeti ve şablon sürümüyle anahtarlanır. Bir dosya
+    yalnızca sonuçları çıktıya yazıldıktan sonra tamamlandı işaretlenir;
+    yarıda kalan çalışma tekrar başlatılınca tamamlanan dosyalar atlanır,
+    hatalılar yeniden denenir.
+    """
+
+    def __init__(self, db_path, version):
+        self.db_path = db_path
+        self.version = version
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS run_files ("
+            "file_hash TEXT NOT NULL, template_version TEXT NOT NULL, path TEXT NOT NULL, "
+            "status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, pages INTEGER, "
+            "error TEXT, elapsed REAL, updated REAL NOT NULL, "
+            "PRIMARY KEY (file_hash, template_version))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS run_fields ("
+            "file_hash TEXT NOT NULL, template_version TEXT NOT NULL, page INTEGER NOT NULL, "
+            "field TEXT NOT NULL, status TEXT NOT NULL, source TEXT, value TEXT, "
+            "PRIMARY KEY (file_hash, template_version, page, field))"
+        )
+        self._conn.commit()
+
+    def completed(self):
+        """Bu şablon sürümünde tamamlanmış dosya özetleri"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT file_hash FROM run_files WHERE template_version = ? AND status = 'done'",
+                (self.version,)
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def attempts(self):
+        """Bu şablon sürümünde hatalı biten dosyaların deneme sayıları"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT file_hash, attempts FROM run_files WHERE template_version = ? AND status = 'failed'",
+                (self.version,)
+            ).fetchall()
+        return dict(rows)
+
+    def has_progress(self):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM run_files WHERE template_version = ? LIMIT 1", (self.version,)
+            ).fetchone()
+        return row is not None
+
+    def record_file(self, file_hash, file_path, records):
+        """ocr_batch kayıtlarından dosya ve alan durumlarını yaz, dosya durumunu döndür"""
+        return self.record_files([(file_hash, file_path, records)])[0]
+
+    def record_files(self, entries):
+        """[(özet, yol, kayıtlar)] listesini tek işlemde yaz, dosya durumlarını döndür"""
+        now = time.time()
+        file_rows, field_rows, statuses = [], [], []
+
+        for file_hash, file_path, records in entries:
+            errors = [record["error"] for record in records if record["error"]]
+            statuses.append("failed" if errors else "done")
+            file_rows.append((file_hash, self.version, file_path, statuses[-1], len(records),
+                              errors[0] if errors else None,
+                              sum(record.get("elapsed", 0.0) for record in records), now))
+
+            for record in records:
+                page = record["page"] if record["page"] is not None else 0
+                text_layer = set(record.get("text_layer_fields") or ())
+                for field_name, value in record["results"].items():
+                    if record["error"]:
+                        field_status = "failed"
+                    else:
+                        field_status = "done" if value else "empty"
+                    source = "text_layer" if field_name in text_layer else "ocr"
+                    field_rows.append((file_hash, self.version, page, field_name, field_status, source, value))
+
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO run_files (file_hash, template_version, path, status, attempts, pages, error, "
+                "elapsed, updated) VALUES (?, ?, ?, ?, 1, ?, ?, ?, ?) "
+                "ON CONFLICT (file_hash, template_version) DO UPDATE SET path = excluded.path, "
+                "status = excluded.status, attempts = run_files.attempts + 1, pages = excluded.pages, "
+                "error = excluded.error, elapsed = excluded.elapsed, updated = excluded.updated",
+                file_rows
+            )
+            # Önceki denemenin alanları (ör. sayfa sayısı farklıysa) kalmasın
+            self._conn.executemany(
+                "DELETE FROM run_fields WHERE file_hash = ? AND template_version = ?",
+                [(file_hash, self.version) for file_hash, _, _ in entries]
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO run_fields (file_hash, template_version, page, field, status, source, value) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                field_rows
+            )
+        return statuses
+
+    def summary(self):
+        """Bu şablon sürümündeki dosya ve alan durum sayıları"""
+        with self._lock:
+            files = dict(self._conn.execute(
+                "SELECT status, COUNT(*) FROM run_files WHERE template_version = ? GROUP BY status",
+                (self.version,)
+            ).fetchall())
+            fields = dict(self._conn.execute(
+                "SELECT status, COUNT(*) FROM run_fields WHERE template_version = ? GROUP BY status",
+                (self.version,)
+            ).fetchall())
+        return {"files": files, "fields": fields}
+
+    def reset(self):
+        """Bu şablon sürümünün ilerlemesini sil (baştan çalıştırma)"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM run_files WHERE template_version = ?", (self.version,))
+            self._conn.execute("DELETE FROM run_fields WHERE template_version = ?", (self.version,))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,258 @@
+# template_library.py
+import argparse
+import datetime
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+from collections import namedtuple
+
+import numpy as np
+from PIL import Image
+
+DEFAULT_LIBRARY_SETTINGS = {
+    "enabled": False,
+    "directory": "templates",
+    "max_distance": 0.3
+}
+
+# dHash ızgarası (HASH_SIZE x HASH_SIZE bit) ve mürekkep yoğunluğu ızgarası (genişlik, yükseklik)
+HASH_SIZE = 16
+LAYOUT_SIZE = (24, 32)
+
+# image_size: koordinatların çizildiği resmin boyutu; template_image hizalama için şablon resmi
+FormTemplate = namedtuple("FormTemplate", ["name", "coordinates", "field_settings", "image_size", "template_image"])
+
+
+def page_fingerprint(image):
+    """Sayfanın (dHash bitleri, mürekkep yoğunluğu ızgarası, en/boy oranı) parmak izi"""
+    # Paletli / 1 bitlik resimler yalnızca en yakın komşu ile küçültülebilir
+    if image.mode not in ('L', 'RGB'):
+        image = image.convert('RGB')
+    # Önce küçültüp sonra griye çevirmek tam sayfa dönüşümünden çok daha ucuz
+    small = np.asarray(image.resize((HASH_SIZE + 1, HASH_SIZE), Image.Resampling.BILINEAR).convert('L'),
+                       dtype=np.int16)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+
+    layout = np.asarray(image.resize(LAYOUT_SIZE, Image.Resampling.BOX).convert('L'), dtype=np.float32)
+    ink = (1.0 - layout / 255.0).ravel()
+
+    return bits, ink, image.size[0] / max(image.size[1], 1)
+
+
+def scale_coordinates(coordinates_dict, scale_x, scale_y):
+    """Koordinatları farklı çözünürlükteki resme ölçekle"""
+    return {
+        field_name: [int(coords[0] * scale_x), int(coords[1] * scale_y),
+                     int(coords[2] * scale_x), int(coords[3] * scale_y)] if coords else coords
+        for field_name, coords in coordinates_dict.items()
+    }
+
+
+def _safe_name(name):
+    return re.sub(r'[^\w.-]+', '_', name, flags=re.UNICODE).strip('_') or "template"
+
+
+class TemplateLibrary:
+    """Parmak izli form şablonları ve sayfa için en yakın şablonu bulan indeks
+
+    Her şablon klasörde <ad>.json (alanlar + parmak izi) ve <ad>.png
+    (hizalama için şablon resmi) olarak saklanır. Parmak izleri tek
+    matriste tutulur; bir sayfa tüm şablonlarla tek vektör işlemiyle
+    karşılaştırılır.
+    """
+
+    # Mesafe = ağırlıklı dHash Hamming oranı + düzen korelasyon uzaklığı + en/boy farkı
+    HASH_WEIGHT = 0.4
+    LAYOUT_WEIGHT = 0.5
+    ASPECT_WEIGHT = 0.1
+
+    def __init__(self, directory="templates", max_distance=0.3):
+        self.directory = directory
+        self.max_distance = max_distance
+        self.templates = []
+        self._lock = threading.Lock()
+        self._bits = np.zeros((0, HASH_SIZE * HASH_SIZE), dtype=bool)
+        self._layouts = np.zeros((0, LAYOUT_SIZE[0] * LAYOUT_SIZE[1]), dtype=np.float32)
+        self._aspects = np.zeros(0, dtype=np.float32)
+        self.load()
+
+    def load(self):
+        """Klasördeki tüm şablonları okuyup indeksi yeniden kur"""
+        templates, bits, layouts, aspects = [], [], [], []
+
+        if os.path.isdir(self.directory):
+            for entry in sorted(os.scandir(self.directory), key=lambda e: e.name):
+                if not entry.name.endswith('.json'):
+                    continue
+                try:
+                    with open(entry.path, 'r', encoding='utf-8') as f:
+                        data = json.load(f)
+                    fingerprint = data["fingerprint"]
+                except (IOError, json.JSONDecodeError, KeyError) as e:
+                    print(f"{entry.name} şablonu okunamadı: {e}")
+                    continue
+
+                templates.append(self._template_from_data(data))
+                bits.append(np.unpackbits(np.frombuffer(bytes.fromhex(fingerprint["dhash"]), dtype=np.uint8))
+                            .astype(bool))
+                layouts.append(np.asarray(fingerprint["layout"], dtype=np.float32))
+                aspects.append(fingerprint["aspect"])
+
+        with self._lock:
+            self.templates = templates
+            if templates:
+                self._bits = np.vstack(bits)
+                self._layouts = np.vstack(layouts)
+                self._aspects = np.asarray(aspects, dtype=np.float32)
+
+    def _template_from_data(self, data):
+        template_image = data.get("template_image")
+        if template_image and not os.path.isabs(template_image):
+            template_image = os.path.join(self.directory, template_image)
+
+        fields = data["form_fields"]
+        return FormTemplate(
+            name=data["template_name"],
+            coordinates={name: field["coordinates"] for name, field in fields.items() if field.get("coordinates")},
+            field_settings={name: {"data_type": field.get("data_type", "text"),
+                                   "max_length": field.get("max_length"),
+                                   "blank_threshold": field.get("blank_threshold")}
+                            for name, field in fields.items()},
+            image_size=tuple(data["image_size"]) if data.get("image_size") else None,
+            template_image=template_image
+        )
+
+    def add(self, name, image, form_fields):
+        """Şablonu parmak iziyle kaydet ve indekse ekle
+
+        form_fields: konfigürasyondaki biçimde {alan: {"coordinates", "data_type", ...}}
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        base = _safe_name(name)
+        image_file = f"{base}.png"
+        image.save(os.path.join(self.directory, image_file))
+
+        bits, ink, aspect = page_fingerprint(image)
+        data = {
+            "template_name": name,
+            "created_date": datetime.datetime.now().isoformat(),
+            "image_size": list(image.size),
+            "template_image": image_file,
+            "form_fields": form_fields,
+            "fingerprint": {
+                "dhash": np.packbits(bits).tobytes().hex(),
+                "layout": [round(float(value), 3) for value in ink],
+                "aspect": round(aspect, 4)
+            }
+        }
+
+        # Çalışan işçiler yarım dosya okumasın
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, os.path.join(self.directory, f"{base}.json"))
+
+        self.load()
+        return self._template_from_data(data)
+
+    def rank(self, image):
+        """Tüm şablonları sayfaya uzaklığa göre sırala: [(uzaklık, şablon)]"""
+        with self._lock:
+            templates = self.templates
+            if not templates:
+                return []
+            template_bits, template_layouts, template_aspects = self._bits, self._layouts, self._aspects
+
+        bits, ink, aspect = page_fingerprint(image)
+
+        hash_distance = np.count_nonzero(template_bits != bits, axis=1) / bits.size
+
+        # Pearson korelasyonu: mürekkep miktarından (tarama koyuluğu) bağımsız düzen benzerliği
+        centered = template_layouts - template_layouts.mean(axis=1, keepdims=True)
+        page_centered = ink - ink.mean()
+        norms = np.linalg.norm(centered, axis=1) * np.linalg.norm(page_centered)
+        correlation = (centered @ page_centered) / np.where(norms > 0, norms, 1)
+        layout_distance = (1 - correlation) / 2
+
+        aspect_distance = np.minimum(np.abs(np.log(template_aspects / aspect)), 1.0)
+
+        distances = (self.HASH_WEIGHT * hash_distance + self.LAYOUT_WEIGHT * layout_distance +
+                     self.ASPECT_WEIGHT * aspect_distance)
+        order = np.argsort(distances)
+        return [(float(distances[i]), templates[i]) for i in order]
+
+    def match(self, image):
+        """Sayfaya en yakın şablonu döndür (max_distance içinde yoksa None)"""
+        ranked = self.rank(image)
+        if ranked and ranked[0][0] <= self.max_distance:
+            return ranked[0][1]
+        return None
+
+
+def create_library(settings=None):
+    """template_library ayarlarından kütüphane oluştur (kapalıysa None)"""
+    merged = dict(DEFAULT_LIBRARY_SETTINGS)
+    merged.update(settings or {})
+
+    if not merged["enabled"]:
+        return None
+
+    library = TemplateLibrary(merged["directory"], merged["max_distance"])
+    print(f"Şablon kütüphanesi: {len(library.templates)} şablon ({merged['directory']})")
+    return library
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m template_library",
+        description="Form şablonu kütüphanesini yönet"
+    )
+    parser.add_argument("--directory", default=DEFAULT_LIBRARY_SETTINGS["directory"], help="Şablon klasörü")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("add", help="Konfigürasyondaki alanları örnek form resmiyle şablon olarak ekle")
+    add.add_argument("--name", required=True, help="Şablon adı (ör. form sürümü)")
+    add.add_argument("--image", required=True, help="Koordinatların çizildiği örnek form resmi")
+    add.add_argument("--config", default="form_config.json", help="Alanların alınacağı konfigürasyon")
+
+    commands.add_parser("list", help="Şablonları listele")
+
+    match = commands.add_parser("match", help="Resme en yakın şablonları göster")
+    match.add_argument("--image", required=True)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    library = TemplateLibrary(args.directory)
+
+    if args.command == "add":
+        from config_manager import ConfigManager
+        form_fields = ConfigManager(args.config).load_config()["form_fields"]
+        with Image.open(args.image) as image:
+            template = library.add(args.name, image.convert('RGB'), form_fields)
+        print(f"✓ {template.name} eklendi ({len(template.coordinates)} alan)")
+
+    elif args.command == "list":
+        for template in library.templates:
+            print(f"{template.name}: {len(template.coordinates)} alan, {template.image_size}")
+
+    elif args.command == "match":
+        import time
+        with Image.open(args.image) as image:
+            image.load()
+            start = time.perf_counter()
+            ranked = library.rank(image)
+            elapsed = (time.perf_counter() - start) * 1000
+        for distance, template in ranked[:5]:
+            print(f"{distance:.3f}  {template.name}")
+        print(f"{len(ranked)} şablon {elapsed:.1f} ms içinde karşılaştırıldı")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+# tesseract_backend.py
+import threading
+
+# Tesseract sayfa bölütleme modları
+PSM_BLOCK = 6        # Düzgün blok
+PSM_SINGLE_LINE = 7  # Tek satır
+PSM_SINGLE_WORD = 8  # Tek kelime
+
+# Boşluksuz tek parça okunan veri tipleri
+SINGLE_WORD_DATA_TYPES = ("date", "email")
+# Değeri boşluk içerebilen tek satırlık veri tipleri ("0532 418 27 65",
+# "1.249,90 TL"); PSM 8 bunları keser veya birleştirir
+SINGLE_LINE_DATA_TYPES = ("digits", "amount", "iban")
+# Bu kadar karakterlik rakam alanları (ör. kartın son 4 hanesi) tek kelimedir
+SINGLE_WORD_MAX_DIGITS = 6
+
+# Genişlik / yükseklik oranı bunun üzerindeyse alan tek satır kabul edilir
+SINGLE_LINE_MIN_ASPECT = 2.5
+
+
+class TesseractBackend:
+    """Alan geometrisine göre PSM seçen, tek geçişte güven skoru döndüren Tesseract arayüzü"""
+
+    def __init__(self, language="tur", persistent=True):
+        self.language = language
+        self.persistent = persistent
+        self._api = None
+        self._api_failed = False
+        # tesserocr API nesnesi thread güvenli değil
+        self._api_lock = threading.Lock()
+
+    def choose_psm(self, image, data_type=None, max_chars=None):
+        """Veri tipine, en fazla karakter sayısına ve kırpıntı oranına göre sayfa bölütleme modu seç"""
+        if data_type in SINGLE_WORD_DATA_TYPES:
+            return PSM_SINGLE_WORD
+        if data_type == "digits" and max_chars and max_chars <= SINGLE_WORD_MAX_DIGITS:
+            return PSM_SINGLE_WORD
+
+        width, height = image.size
+        if data_type in SINGLE_LINE_DATA_TYPES or width / max(height, 1) >= SINGLE_LINE_MIN_ASPECT:
+            return PSM_SINGLE_LINE
+        return PSM_BLOCK
+
+    def extract(self, image, data_type=None, max_chars=None):
+        """Metni ve 0-1 arası ortalama kelime güvenini döndür"""
+        psm = self.choose_psm(image, data_type, max_chars)
+
+        api = self._persistent_api()
+        if api is not None:
+            return self._extract_with_api(api, image, psm)
+        return self._extract_with_subprocess(image, psm)
+
+    def _persistent_api(self):
+        """tesserocr kuruluysa süreç boyunca açık kalan API nesnesini döndür"""
+        if not self.persistent or self._api_failed:
+            return None
+
+        if self._api is None:
+            with self._api_lock:
+                if self._api is None and not self._api_failed:
+                    try:
+                        import tesserocr
+                        self._api = tesserocr.PyTessBaseAPI(lang=self.language)
+                        print("✓ Tesseract kalıcı API ile kullanılıyor (tesserocr)")
+                    except Exception as e:
+                        # tesserocr yoksa her çağrıda tesseract süreci başlatılır
+                        print(f"tesserocr kullanılamıyor, pytesseract'a dönülüyor: {e}")
+                        self._api_failed = True
+                        return None
+
+        return self._api
+
+    def _extract_with_api(self, api, image, psm):
+        with self._api_lock:
+            api.SetPageSegMode(psm)
+            api.SetImage(image)
+            text = api.GetUTF8Text()
+            word_confidences = api.AllWordConfidences()
+
+        if not text.strip() or not word_confidences:
+            return "", 0.0
+        return text, sum(word_confidences) / len(word_confidences) / 100
+
+    def _extract_with_subprocess(self, image, psm):
+        import pytesseract
+
+        config = f'--oem 3 --psm {psm} -l {self.language}'
+        data = pytesseract.image_to_data(image, config=config, output_type=pytesseract.Output.DICT)
+
+        words = []
+        confidences = []
+        for text, conf in zip(data["text"], data["conf"]):
+            conf = float(conf)
+            # conf -1 kelime olmayan düzen satırlarıdır
+            if text.strip() and conf >= 0:
+                words.append(text)
+                confidences.append(conf)
+
+        if not words:
+            return "", 0.0
+        return ' '.join(words), sum(confidences) / len(confidences) / 100
+
+    def close(self):
+        with self._api_lock:
+            if self._api is not None:
+                self._api.End()
+                self._api = None
@@ -0,0 +1,148 @@
+# trocr_parity.py
+import argparse
+import json
+import os
+import sys
+import time
+
+from PIL import Image
+
+from ocr_processor import OCRProcessor
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+# Depoyla gelen sabit kırpıntı seti: form alanı türlerinden örnekler
+# (dar "Son 4 Hane" dahil) ve doğru metinleri labels.json içinde
+DEFAULT_CROPS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "parity_crops")
+LABELS_FILE = "labels.json"
+
+
+def character_error_rate(reference, hypothesis):
+    """Levenshtein uzaklığının referans uzunluğuna oranı"""
+    if not reference:
+        return 0.0 if not hypothesis else 1.0
+
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref_char in enumerate(reference, start=1):
+        current = [i]
+        for j, hyp_char in enumerate(hypothesis, start=1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ref_char != hyp_char)
+            ))
+        previous = current
+
+    return previous[-1] / len(reference)
+
+
+def load_crops(crops_dir):
+    """Klasördeki sabit kırpıntıları isim sırasıyla yükle"""
+    crops = []
+    for name in sorted(os.listdir(crops_dir)):
+        if name.lower().endswith(IMAGE_EXTENSIONS):
+            with Image.open(os.path.join(crops_dir, name)) as image:
+                crops.append((name, image.convert('RGB')))
+    return crops
+
+
+def load_labels(crops_dir):
+    """Kırpıntıların doğru metinleri ({dosya: metin}, yoksa boş)"""
+    labels_path = os.path.join(crops_dir, LABELS_FILE)
+    if not os.path.exists(labels_path):
+        return {}
+    with open(labels_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _timed_extract(processor, crops):
+    outputs = []
+    start = time.perf_counter()
+    for _, image in crops:
+        outputs.append(processor._trocr_extract(image))
+    return outputs, time.perf_counter() - start
+
+
+def compare_backends(crops, backend, reference_backend="trocr", labels=None):
+    """İki backend'in _trocr_extract çıktılarını kırpıntı kırpıntı karşılaştır
+
+    labels verilirse her iki backend'in doğru metne göre CER'i de raporlanır.
+    """
+    reference = OCRProcessor(model_type=reference_backend)
+    candidate = OCRProcessor(model_type=backend)
+
+    if not reference.model or not candidate.model:
+        raise RuntimeError("Karşılaştırılacak TrOCR backend'lerinden biri yüklenemedi")
+
+    reference_texts, reference_seconds = _timed_extract(reference, crops)
+    candidate_texts, candidate_seconds = _timed_extract(candidate, crops)
+
+    mismatches = []
+    total_cer = 0.0
+    for (name, _), expected, actual in zip(crops, reference_texts, candidate_texts):
+        cer = character_error_rate(expected, actual)
+        total_cer += cer
+        if expected != actual:
+            mismatches.append({"crop": name, "reference": expected, "candidate": actual, "cer": round(cer, 4)})
+
+    label_cer = None
+    labelled = [(labels[name], reference_text, candidate_text)
+                for (name, _), reference_text, candidate_text in zip(crops, reference_texts, candidate_texts)
+                if labels and name in labels]
+    if labelled:
+        label_cer = {
+            reference_backend: round(sum(character_error_rate(label, text) for label, text, _ in labelled)
+                                     / len(labelled), 4),
+            backend: round(sum(character_error_rate(label, text) for label, _, text in labelled)
+                           / len(labelled), 4)
+        }
+
+    return {
+        "backend": backend,
+        "reference_backend": reference_backend,
+        "crops": len(crops),
+        "exact_matches": len(crops) - len(mismatches),
+        "mean_cer": round(total_cer / max(len(crops), 1), 4),
+        "reference_seconds": round(reference_seconds, 3),
+        "candidate_seconds": round(candidate_seconds, 3),
+        "label_cer": label_cer,
+        "mismatches": mismatches
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m trocr_parity",
+        description="Kuantize/ONNX TrOCR çıktısını fp32 TrOCR ile sabit kırpıntılarda karşılaştır"
+    )
+    parser.add_argument("--backend", required=True, choices=("trocr-int8", "trocr-onnx"))
+    parser.add_argument("--crops", default=DEFAULT_CROPS_DIR,
+                        help="Karşılaştırmada kullanılacak kırpıntı klasörü (varsayılan: depodaki parity_crops)")
+    parser.add_argument("--max-cer", type=float, default=0.02,
+                        help="İzin verilen en yüksek ortalama karakter hata oranı")
+    args = parser.parse_args(argv)
+
+    crops = load_crops(args.crops)
+    if not crops:
+        print(f"{args.crops} içinde kırpıntı bulunamadı")
+        return 1
+
+    report = compare_backends(crops, args.backend, labels=load_labels(args.crops))
+
+    for mismatch in report["mismatches"]:
+        print(f"≠ {mismatch['crop']}: '{mismatch['reference']}' -> '{mismatch['candidate']}' "
+              f"(CER {mismatch['cer']})")
+    print(f"{report['exact_matches']}/{report['crops']} birebir aynı, ortalama CER {report['mean_cer']}")
+    if report["label_cer"]:
+        print("Doğru metne göre CER: " +
+              ", ".join(f"{name} {cer}" for name, cer in report["label_cer"].items()))
+    print(f"Süre: fp32 {report['reference_seconds']} sn, {args.backend} {report['candidate_seconds']} sn")
+
+    if report["mean_cer"] > args.max_cer:
+        print(f"✗ Ortalama CER {args.max_cer} sınırını aşıyor")
+        return 1
+    print("✓ Parite sağlandı")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+# trocr_scheduler.py
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+# Kuyruğa bu nesne konunca zamanlayıcı thread'i durur
+_STOP = object()
+
+
+class TrOCRBatchScheduler:
+    """Eşzamanlı isteklerin kırpıntılarını ortak generate batch'lerinde toplayan zamanlayıcı
+
+    İlk kırpıntı geldikten sonra en fazla max_wait_ms beklenir veya
+    max_batch kırpıntı birikince batch hemen çalıştırılır. Farklı çözümleme
+    profilleri (veri tipi, en fazla karakter) farklı generate ayarları
+    gerektirdiği için ayrı batch'lerde toplanır. Sonuçlar her kırpıntının
+    Future nesnesine (metin, güven) olarak döner.
+    """
+
+    def __init__(self, processor, max_batch=None, max_wait_ms=5):
+        self.processor = processor
+        self.max_batch = max_batch or processor.trocr_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+
+        self._thread = threading.Thread(target=self._run, name="trocr-batch-scheduler", daemon=True)
+        self._thread.start()
+
+    def submit(self, image, data_type=None, max_chars=None):
+        """Kırpıntıyı sıraya al, (metin, güven) ile tamamlanacak Future döndür"""
+        future = Future()
+        self._queue.put(((data_type or "text", max_chars), image, future))
+        return future
+
+    def generate(self, images, data_type=None, max_chars=None):
+        """_trocr_generate ile aynı dönüş; resimler diğer isteklerinkilerle birlikte çözülür"""
+        futures = [self.submit(image, data_type, max_chars) for image in images]
+        return [future.result() for future in futures]
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "batches": self.batches,
+                "items": self.items,
+                "mean_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0
+            }
+
+    def close(self):
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def _run(self):
+        # profil -> [(resim, future)], profil -> son çalıştırma zamanı
+        pending = {}
+        deadlines = {}
+
+        while True:
+            timeout = None
+            if deadlines:
+                timeout = max(0.0, min(deadlines.values()) - time.perf_counter())
+
+            ready = []
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                for profile in list(pending):
+                    self._run_batch(profile, pending.pop(profile))
+                return
+
+            if item is not None:
+                profile, image, future = item
+                if profile not in pending:
+                    pending[profile] = []
+                    deadlines[profile] = time.perf_counter() + self.max_wait
+                pending[profile].append((image, future))
+                if len(pending[profile]) >= self.max_batch:
+                    ready.append(profile)
+
+            now = time.perf_counter()
+            ready.extend(profile for profile, deadline in deadlines.items()
+                         if deadline <= now and profile not in ready)
+
+            for profile in ready:
+                deadlines.pop(profile)
+                self._run_batch(profile, pending.pop(profile))
+
+    def _run_batch(self, profile, entries):
+        # İptal edilen istekler batch'e alınmaz
+        entries = [(image, future) for image, future in entries if future.set_running_or_notify_cancel()]
+        if not entries:
+            return
+
+        data_type, max_chars = profile
+        try:
+            outputs = self.processor._trocr_generate([image for image, _ in entries], data_type, max_chars)
+        except Exception as e:
+            for _, future in entries:
+                future.set_exception(e)
+            return
+
+        for (_, future), output in zip(entries, outputs):
+            future.set_result(output)
+
+        with self._stats_lock:
+            self.batches += 1
+            self.items += len(entries)